@@ -0,0 +1,141 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import pdfplumber
+import pypdfium2 as pdfium
+
+from app import metrics
+
+# Pool de documentos PDF abiertos entre peticiones, para no pagar en cada una
+# el parseo del xref y del catálogo. Cada documento tiene su propio lock: un
+# hilo lo usa a la vez. Se reabre si cambia el mtime/tamaño del archivo y se
+# cierran los menos usados recientemente al superar PDF_POOL_MAX_OPEN.
+PDF_POOL_MAX_OPEN = int(os.getenv("PDF_POOL_MAX_OPEN", "4"))
+
+# pdfium no es thread-safe: todas las llamadas a la librería se serializan.
+pdfium_lock = threading.Lock()
+
+
+def _fingerprint(path: Path) -> tuple:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _PooledDocument:
+    def __init__(self, doc, fingerprint: tuple):
+        self.doc = doc
+        self.fingerprint = fingerprint
+        self.lock = threading.Lock()
+        self.retired = False
+
+
+class DocumentPool:
+    def __init__(self, name: str, opener, closer, max_open: int):
+        self.name = name
+        self._opener = opener
+        self._closer = closer
+        self.max_open = max_open
+        self._entries: "OrderedDict[Path, _PooledDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.opens = 0
+        self.closes = 0
+
+    def _close(self, entry: _PooledDocument):
+        try:
+            self._closer(entry.doc)
+        except Exception as e:
+            print(f"Error closing pooled {self.name} document: {e}")
+        self.closes += 1
+
+    def _retire(self, path: Path):
+        # Saca el documento del pool; si está en uso lo cierra quien lo tiene
+        entry = self._entries.pop(path)
+        entry.retired = True
+        if entry.lock.acquire(blocking=False):
+            try:
+                self._close(entry)
+            finally:
+                entry.lock.release()
+
+    def _evict(self):
+        # Cierra los documentos menos usados que no estén en uso
+        for path in list(self._entries):
+            if len(self._entries) <= self.max_open:
+                return
+            if not self._entries[path].lock.locked():
+                self._retire(path)
+
+    def _entry(self, path: Path) -> _PooledDocument:
+        fingerprint = _fingerprint(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.fingerprint == fingerprint:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+
+            if entry is not None:
+                # El archivo cambió en disco
+                self._retire(path)
+
+            with metrics.stage("pdf_open"):
+                doc = self._opener(path)
+            entry = _PooledDocument(doc, fingerprint)
+            self.opens += 1
+            self._entries[path] = entry
+            self._evict()
+            return entry
+
+    @contextmanager
+    def acquire(self, path: Path):
+        path = Path(path).resolve()
+        while True:
+            entry = self._entry(path)
+            with entry.lock:
+                # Pudo ser retirado mientras esperábamos el lock
+                if not entry.retired:
+                    try:
+                        yield entry.doc
+                    finally:
+                        if entry.retired:
+                            with self._lock:
+                                self._close(entry)
+                    return
+
+    def close_all(self):
+        with self._lock:
+            for path in list(self._entries):
+                self._retire(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": len(self._entries),
+                "max_open": self.max_open,
+                "hits": self.hits,
+                "opens": self.opens,
+                "closes": self.closes,
+            }
+
+
+def _open_pdfium(path: Path):
+    with pdfium_lock:
+        return pdfium.PdfDocument(str(path))
+
+
+def _close_pdfium(doc):
+    with pdfium_lock:
+        doc.close()
+
+
+plumber_pool = DocumentPool("pdfplumber", pdfplumber.open, lambda doc: doc.close(), PDF_POOL_MAX_OPEN)
+pdfium_pool = DocumentPool("pdfium", _open_pdfium, _close_pdfium, PDF_POOL_MAX_OPEN)
+
+
+def close_all():
+    plumber_pool.close_all()
+    pdfium_pool.close_all()
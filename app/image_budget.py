@@ -0,0 +1,293 @@
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+from PIL import Image, ImageChops, ImageStat
+
+from app import metrics
+from app.documents import pdfium_lock, pdfium_pool
+from app.lru import LRUCache
+from app.pdf_index import file_sha256
+from app.render import RenderOptions, data_url, render_page_plan, render_pages_data_urls
+
+# Preparación de imágenes para los prompts de visión. Cada página se analiza con
+# una miniatura en escala de grises: se recorta a la caja del contenido, se
+# quitan cabeceras/pies repetidos entre las páginas de la misma llamada y se
+# descartan las páginas en blanco. El presupuesto se cuenta en tokens de imagen
+# (estimate_image_tokens): nunca se renderiza más de lo que el servicio conserva
+# (lado corto 768 px, lado largo 2048 px), cada recorte se escala para llenar
+# sus teselas de 512 px y, si el plan recortado costara más tokens que las
+# páginas completas, se envían las páginas completas.
+IMAGE_BUDGET_ENABLED = os.getenv("IMAGE_BUDGET_ENABLED", "true").lower() in ("1", "true", "yes")
+# El servicio reescala cualquier imagen a un máximo de 2048 px por lado y
+# después el lado corto a 768 px, en teselas de 512 px
+IMAGE_MAX_LONG_SIDE = int(os.getenv("IMAGE_MAX_LONG_SIDE", "2048"))
+IMAGE_MAX_SHORT_SIDE = int(os.getenv("IMAGE_MAX_SHORT_SIDE", "768"))
+IMAGE_TILE_SIZE = 512
+
+LAYOUT_DPI = 50
+INK_THRESHOLD = 200  # gris por debajo = tinta
+BLOCK_GAP_PT = 6  # separación mínima entre bloques de contenido
+MARGIN_BAND = 0.15  # cabeceras/pies solo en el 15% superior/inferior
+BAND_MAX_DIFF = 12.0  # diferencia media (0-255) para considerar dos bandas iguales
+CONTENT_PADDING_PT = 8
+DIAGRAM_MIN_PATHS = 40
+LAYOUT_CACHE_ITEMS = 1024
+
+
+@dataclass
+class PageLayout:
+    width: float
+    height: float
+    # Bloques de contenido (arriba, abajo, izquierda, derecha) en puntos,
+    # con origen en la esquina superior izquierda
+    blocks: List[Tuple[float, float, float, float]]
+    has_diagram: bool
+    first_band: Optional[Image.Image]
+    last_band: Optional[Image.Image]
+
+
+_layouts: LRUCache[PageLayout] = LRUCache(max_items=LAYOUT_CACHE_ITEMS)
+
+
+def _content_blocks(ink: Image.Image, gap_px: int) -> List[Tuple[int, int]]:
+    # Perfil por filas: media de tinta de cada fila (BOX = promedio exacto)
+    rows = list(ink.resize((1, ink.height), Image.Resampling.BOX).getdata())
+    blocks = []
+    start = end = None
+    for y, value in enumerate(rows):
+        if value:
+            if start is not None and y - end > gap_px:
+                blocks.append((start, end))
+                start = None
+            if start is None:
+                start = y
+            end = y
+    if start is not None:
+        blocks.append((start, end))
+    return blocks
+
+
+def _has_diagram(page: "pdfium.PdfPage") -> bool:
+    paths = 0
+    for obj in page.get_objects(max_depth=2):
+        if obj.type == pdfium_c.FPDF_PAGEOBJ_IMAGE:
+            return True
+        if obj.type == pdfium_c.FPDF_PAGEOBJ_PATH:
+            paths += 1
+            if paths >= DIAGRAM_MIN_PATHS:
+                return True
+    return False
+
+
+def analyze_page(pdf: "pdfium.PdfDocument", page_idx: int) -> PageLayout:
+    scale = LAYOUT_DPI / 72
+    with pdfium_lock:
+        page = pdf[page_idx]
+        try:
+            width, height = page.get_size()
+            image = page.render(scale=scale, grayscale=True).to_pil()
+            has_diagram = _has_diagram(page)
+        finally:
+            page.close()
+
+    gray = image.convert("L")
+    ink = gray.point(lambda v: 255 if v < INK_THRESHOLD else 0)
+    blocks = _content_blocks(ink, max(1, round(BLOCK_GAP_PT * scale)))
+    if not blocks:
+        return PageLayout(width, height, [], has_diagram, None, None)
+
+    boxes = []
+    for top, bottom in blocks:
+        left, _, right, _ = ink.crop((0, top, ink.width, bottom + 1)).getbbox()
+        boxes.append((top / scale, (bottom + 1) / scale, left / scale, right / scale))
+
+    first, last = blocks[0], blocks[-1]
+    return PageLayout(
+        width=width,
+        height=height,
+        blocks=boxes,
+        has_diagram=has_diagram,
+        first_band=gray.crop((0, first[0], gray.width, first[1] + 1)),
+        last_band=gray.crop((0, last[0], gray.width, last[1] + 1)),
+    )
+
+
+def get_layouts(pdf_path: Path, page_indices: List[int]) -> List[PageLayout]:
+    pdf_hash = file_sha256(pdf_path)
+    layouts: Dict[int, PageLayout] = {}
+    for i in page_indices:
+        layout = _layouts.get((pdf_hash, i))
+        if layout is not None:
+            layouts[i] = layout
+
+    missing = [i for i in page_indices if i not in layouts]
+    metrics.cache_result("page_layout", True, len(page_indices) - len(missing))
+    metrics.cache_result("page_layout", False, len(missing))
+    if missing:
+        with pdfium_pool.acquire(pdf_path) as pdf, metrics.stage("layout"):
+            for i in missing:
+                layouts[i] = analyze_page(pdf, i)
+        for i in missing:
+            _layouts.put((pdf_hash, i), layouts[i])
+    return [layouts[i] for i in page_indices]
+
+
+def _same_band(a: Image.Image, b: Image.Image) -> bool:
+    if a.size[0] != b.size[0] or abs(a.size[1] - b.size[1]) > 1:
+        return False
+    height = min(a.size[1], b.size[1])
+    diff = ImageChops.difference(a.crop((0, 0, a.width, height)), b.crop((0, 0, b.width, height)))
+    return ImageStat.Stat(diff).mean[0] <= BAND_MAX_DIFF
+
+
+def _repeated(layouts: List[PageLayout], first: bool) -> bool:
+    # Bloque en el margen, en la misma posición y casi idéntico en todas las páginas
+    # Las páginas en blanco no cuentan; las demás necesitan contenido además del bloque
+    pages = [layout for layout in layouts if layout.blocks]
+    if len(pages) < 2 or any(len(layout.blocks) < 2 for layout in pages):
+        return False
+    bands = []
+    for layout in pages:
+        top, bottom = (layout.blocks[0] if first else layout.blocks[-1])[:2]
+        in_margin = (
+            bottom <= layout.height * MARGIN_BAND
+            if first
+            else top >= layout.height * (1 - MARGIN_BAND)
+        )
+        if not in_margin:
+            return False
+        bands.append(((top, bottom), layout.first_band if first else layout.last_band))
+    (ref_pos, ref_band) = bands[0]
+    return all(
+        abs(pos[0] - ref_pos[0]) <= 2 and _same_band(band, ref_band) for pos, band in bands[1:]
+    )
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    # Modelo de tokens de visión "high detail": encaje en 2048x2048, lado corto
+    # a 768 px y 170 tokens por tesela de 512 px + 85 fijos
+    scale = min(1.0, IMAGE_MAX_LONG_SIDE / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, IMAGE_MAX_SHORT_SIDE / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / IMAGE_TILE_SIZE) * math.ceil(height / IMAGE_TILE_SIZE)
+
+
+def _max_scale(width: float, height: float, max_dpi: int) -> float:
+    # Por encima de esta escala el servicio descarta los píxeles extra
+    return min(
+        max_dpi / 72,
+        IMAGE_MAX_LONG_SIDE / max(width, height),
+        IMAGE_MAX_SHORT_SIDE / min(width, height),
+    )
+
+
+def _dpi(scale: float) -> int:
+    # Hacia abajo, para no pasar nunca de la tesela o del lado máximo calculados
+    return max(1, int(scale * 72))
+
+
+def _image_size(layout: PageLayout, options: RenderOptions) -> Tuple[int, int]:
+    left, bottom, right, top = options.crop
+    scale = options.dpi / 72
+    return (
+        int((layout.width - left - right) * scale),
+        int((layout.height - top - bottom) * scale),
+    )
+
+
+def _plan_tokens(by_page: Dict[int, PageLayout], plan: List[Tuple[int, RenderOptions]]) -> int:
+    return sum(
+        estimate_image_tokens(*_image_size(by_page[page_idx], options)) for page_idx, options in plan
+    )
+
+
+def plan_pages(
+    page_indices: List[int], layouts: List[PageLayout], max_dpi: int
+) -> List[Tuple[int, RenderOptions]]:
+    full_plan = [
+        (page_idx, RenderOptions(dpi=_dpi(_max_scale(layout.width, layout.height, max_dpi)), max_pixels=0))
+        for page_idx, layout in zip(page_indices, layouts)
+    ]
+    skip_header = _repeated(layouts, first=True)
+    skip_footer = _repeated(layouts, first=False)
+
+    regions = []
+    for page_idx, layout in zip(page_indices, layouts):
+        blocks = layout.blocks[1 if skip_header else 0 : -1 if skip_footer else None]
+        if not blocks:
+            continue  # página en blanco (o solo cabecera/pie)
+        top = max(0.0, blocks[0][0] - CONTENT_PADDING_PT)
+        bottom = min(layout.height, blocks[-1][1] + CONTENT_PADDING_PT)
+        left = max(0.0, min(block[2] for block in blocks) - CONTENT_PADDING_PT)
+        right = min(layout.width, max(block[3] for block in blocks) + CONTENT_PADDING_PT)
+        crop = (
+            int(left),
+            int(layout.height - bottom),
+            int(layout.width - right),
+            int(top),
+        )
+        width = layout.width - crop[0] - crop[2]
+        height = layout.height - crop[1] - crop[3]
+        regions.append((page_idx, layout, crop, width, height))
+
+    if not regions:
+        return full_plan
+
+    plan = []
+    diagrams = []
+    for page_idx, layout, crop, width, height in regions:
+        # Mismo detalle que la página completa, ampliado hasta llenar sus teselas
+        limit = _max_scale(width, height, max_dpi)
+        scale = min(limit, _max_scale(layout.width, layout.height, max_dpi))
+        columns = math.ceil(width * scale / IMAGE_TILE_SIZE)
+        rows = math.ceil(height * scale / IMAGE_TILE_SIZE)
+        scale = min(limit, columns * IMAGE_TILE_SIZE / width, rows * IMAGE_TILE_SIZE / height)
+        plan.append((page_idx, RenderOptions(dpi=_dpi(scale), max_pixels=0, crop=crop)))
+        if layout.has_diagram:
+            diagrams.append((len(plan) - 1, _dpi(limit)))
+
+    by_page = dict(zip(page_indices, layouts))
+    budget = _plan_tokens(by_page, full_plan)
+    tokens = _plan_tokens(by_page, plan)
+    if tokens > budget:
+        return full_plan
+
+    # Los tokens que ahorran los recortes se dan a las páginas con diagramas
+    for pos, dpi in diagrams:
+        page_idx, options = plan[pos]
+        upgraded = RenderOptions(dpi=dpi, max_pixels=0, crop=options.crop)
+        extra = _plan_tokens(by_page, [(page_idx, upgraded)]) - _plan_tokens(by_page, [(page_idx, options)])
+        if tokens + extra <= budget:
+            plan[pos] = (page_idx, upgraded)
+            tokens += extra
+    return plan
+
+
+def render_budgeted_data_urls(pdf_path: Path, page_indices: List[int], max_dpi: int) -> List[str]:
+    if not IMAGE_BUDGET_ENABLED:
+        return render_pages_data_urls(pdf_path, page_indices, max_dpi)
+
+    layouts = get_layouts(pdf_path, page_indices)
+    plan = plan_pages(page_indices, layouts, max_dpi)
+    images = render_page_plan(pdf_path, plan)
+
+    by_page = dict(zip(page_indices, layouts))
+    # Páginas, bytes y tokens enviados frente a las mismas páginas completas
+    metrics.IMAGE_BUDGET.inc(len(page_indices), kind="pages")
+    metrics.IMAGE_BUDGET.inc(len(plan), kind="images_sent")
+    metrics.IMAGE_BUDGET.inc(sum(len(data) for data in images), kind="bytes_sent")
+    metrics.IMAGE_BUDGET.inc(_plan_tokens(by_page, plan), kind="tokens_sent")
+    metrics.IMAGE_BUDGET.inc(
+        sum(
+            estimate_image_tokens(int(layout.width * max_dpi / 72), int(layout.height * max_dpi / 72))
+            for layout in layouts
+        ),
+        kind="tokens_full_pages",
+    )
+    return [data_url(data, options) for data, (_, options) in zip(images, plan)]
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.pdf_index import write_atomic
+
+# Motor de trabajos de traducción por lotes. El estado de cada trabajo se
+# persiste en DATA_DIR/.jobs/{job_id}.json después de cada pregunta, de modo
+# que al reiniciar el servidor los trabajos sin terminar continúan donde se
+# quedaron. Las preguntas ya guardadas (en español) se omiten. La escritura
+# corre en un hilo y los cambios que llegan mientras tanto se agrupan en la
+# siguiente, así el bucle de eventos nunca espera al disco.
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, CANCELLED)
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    # 503 con Retry-After (QueueFullError, LLMThrottledError): saturación pasajera
+    if not isinstance(e, HTTPException) or e.status_code != 503:
+        return None
+    try:
+        return max(0.0, float((e.headers or {})["Retry-After"]))
+    except (KeyError, ValueError):
+        return None
+
+
+class TranslationJob:
+    def __init__(self, data: dict, path: Path):
+        self.data = data
+        self.path = path
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self._run_started = None
+        self._run_done = 0
+        self._dirty = False
+        self._writer: Optional[asyncio.Task] = None
+
+    @property
+    def id(self) -> str:
+        return self.data["id"]
+
+    @property
+    def status(self) -> str:
+        return self.data["status"]
+
+    def save(self):
+        self._dirty = True
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write())
+
+    async def _write(self):
+        while self._dirty:
+            self._dirty = False
+            # Se serializa en el bucle para escribir un estado coherente
+            data = json.dumps(self.data, ensure_ascii=False).encode("utf-8")
+            try:
+                await asyncio.to_thread(write_atomic, self.path, data)
+            except Exception as e:
+                print(f"Error saving job {self.id}: {e}")
+
+    async def flush(self):
+        # shield: cancelar a quien espera no interrumpe la escritura en curso
+        while self._writer is not None and not self._writer.done():
+            await asyncio.shield(self._writer)
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def snapshot(self) -> dict:
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, SKIPPED: 0, FAILED: 0}
+        for state in self.data["questions"].values():
+            counts[state] += 1
+
+        throughput = 0.0
+        if self._run_started is not None and self._run_done:
+            elapsed = time.time() - self._run_started
+            throughput = round(self._run_done / elapsed * 60, 2) if elapsed > 0 else 0.0
+
+        return {
+            "id": self.id,
+            "status": self.status,
+            "pdf_filename": self.data["pdf_filename"],
+            "start_question": self.data["start_question"],
+            "end_question": self.data["end_question"],
+            "concurrency": self.data["concurrency"],
+            "total": len(self.data["questions"]),
+            "done": counts[DONE] + counts[SKIPPED],
+            "translated": counts[DONE],
+            "skipped": counts[SKIPPED],
+            "failed": counts[FAILED],
+            "running": counts[RUNNING],
+            "pending": counts[PENDING],
+            "questions_per_minute": throughput,
+            "errors": self.data["errors"],
+            "created_at": self.data["created_at"],
+            "updated_at": self.data["updated_at"],
+        }
+
+
+class JobManager:
+    def __init__(
+        self,
+        jobs_dir: Path,
+        translate: Callable[[str, int], Awaitable[dict]],
+        is_translated: Callable[[str, int], bool],
+    ):
+        self.jobs_dir = jobs_dir
+        self._translate = translate
+        self._is_translated = is_translated
+        self.jobs: Dict[str, TranslationJob] = {}
+
+    def create(
+        self, pdf_filename: str, start_question: int, end_question: int, concurrency: int
+    ) -> TranslationJob:
+        now = time.time()
+        job_id = uuid.uuid4().hex[:12]
+        job = TranslationJob(
+            {
+                "id": job_id,
+                "status": PENDING,
+                "pdf_filename": pdf_filename,
+                "start_question": start_question,
+                "end_question": end_question,
+                "concurrency": concurrency,
+                "questions": {
+                    str(q): PENDING for q in range(start_question, end_question + 1)
+                },
+                "errors": {},
+                "created_at": now,
+                "updated_at": now,
+            },
+            self.jobs_dir / f"{job_id}.json",
+        )
+        job.save()
+        self.jobs[job_id] = job
+        self._start(job)
+        return job
+
+    def resume_all(self):
+        # Reanuda los trabajos que quedaron a medias antes de reiniciar
+        if not self.jobs_dir.exists():
+            return
+        for job_file in sorted(self.jobs_dir.glob("*.json")):
+            try:
+                with open(job_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"Error reading job {job_file}: {e}")
+                continue
+
+            job = TranslationJob(data, job_file)
+            self.jobs[job.id] = job
+            if job.status not in FINISHED_STATES:
+                for q, state in data["questions"].items():
+                    if state == RUNNING:
+                        data["questions"][q] = PENDING
+                print(f"Resuming translation job {job.id}")
+                self._start(job)
+
+    def _start(self, job: TranslationJob):
+        job.task = asyncio.create_task(self._run(job))
+
+    def _update(self, job: TranslationJob, q: str, state: str, error: str = None):
+        job.data["questions"][q] = state
+        if error:
+            job.data["errors"][q] = error
+        else:
+            job.data["errors"].pop(q, None)
+        job.data["updated_at"] = time.time()
+        job.save()
+        job.notify()
+
+    async def _run(self, job: TranslationJob):
+        pdf_filename = job.data["pdf_filename"]
+        job.data["status"] = RUNNING
+        job._run_started = time.time()
+        job._run_done = 0
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for q, state in job.data["questions"].items():
+            if state in (PENDING, FAILED):
+                if await asyncio.to_thread(self._is_translated, pdf_filename, int(q)):
+                    self._update(job, q, SKIPPED)
+                else:
+                    queue.put_nowait(q)
+        job.save()
+        job.notify()
+
+        async def worker():
+            while True:
+                try:
+                    q = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                self._update(job, q, RUNNING)
+                try:
+                    await self._translate(pdf_filename, int(q))
+                    job._run_done += 1
+                    self._update(job, q, DONE)
+                except asyncio.CancelledError:
+                    self._update(job, q, PENDING)
+                    raise
+                except Exception as e:
+                    delay = _retry_after(e)
+                    if delay is not None:
+                        # No es un fallo de la pregunta: espera y vuelve a la cola
+                        print(f"Job {job.id}: question {q} throttled, retrying in {delay:g}s")
+                        self._update(job, q, PENDING)
+                        await asyncio.sleep(delay)
+                        queue.put_nowait(q)
+                        continue
+                    detail = getattr(e, "detail", None) or str(e)
+                    print(f"Job {job.id}: question {q} failed: {detail}")
+                    self._update(job, q, FAILED, str(detail))
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(job.data["concurrency"])))
+        except asyncio.CancelledError:
+            if job.status != CANCELLED:
+                # Apagado del servidor: el trabajo queda 'running' y se reanuda
+                job.save()
+                raise
+        else:
+            job.data["status"] = COMPLETED
+        job.data["updated_at"] = time.time()
+        job.save()
+        job.notify()
+
+    def cancel(self, job: TranslationJob):
+        if job.status in FINISHED_STATES:
+            return
+        job.data["status"] = CANCELLED
+        if job.task and not job.task.done():
+            job.task.cancel()
+        job.data["updated_at"] = time.time()
+        job.save()
+        job.notify()
+
+    async def shutdown(self):
+        tasks = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*(job.flush() for job in self.jobs.values()))
+
+    async def events(self, job: TranslationJob, heartbeat: float = 15.0):
+        # Flujo SSE: un evento 'progress' por cada cambio y 'end' al terminar
+        while True:
+            changed = job.changed
+            snapshot = job.snapshot()
+            event = "end" if snapshot["status"] in FINISHED_STATES else "progress"
+            yield f"event: {event}\ndata: {json.dumps(snapshot)}\n\n"
+            if event == "end":
+                return
+            while not changed.is_set():
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
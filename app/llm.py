@@ -0,0 +1,337 @@
+import asyncio
+import base64
+import contextvars
+import heapq
+import io
+import itertools
+import math
+import os
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from openai import AsyncAzureOpenAI
+from PIL import Image
+
+from app import metrics
+from app.image_budget import estimate_image_tokens
+
+load_dotenv()
+
+# Configurar cliente de Azure OpenAI
+azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+api_key = os.getenv("AZURE_OPENAI_API_KEY")
+deployment_name = os.getenv(
+    "AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-5.1"
+)  # Nombre del despliegue en Azure AI Studio
+api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
+
+# Máximo de peticiones simultáneas al modelo (el resto espera su turno sin
+# bloquear el event loop)
+MAX_CONCURRENT_REQUESTS = int(os.getenv("AZURE_OPENAI_MAX_CONCURRENCY", "8"))
+REQUEST_TIMEOUT = float(os.getenv("AZURE_OPENAI_TIMEOUT", "180"))
+
+# Cuota del deployment (0 = sin límite). Azure estima los tokens de cada
+# petición como tokens del prompt + max_tokens y aplica la cuota en ventanas
+# cortas, así que los buckets admiten ráfagas de 1/6 de la cuota por minuto.
+RPM_LIMIT = int(os.getenv("AZURE_OPENAI_RPM", "0"))
+TPM_LIMIT = int(os.getenv("AZURE_OPENAI_TPM", "0"))
+MAX_RETRIES = int(os.getenv("AZURE_OPENAI_MAX_RETRIES", "5"))
+BUCKET_BURST_FRACTION = 1 / 6
+
+# Imagen de tamaño desconocido: página completa en "high detail" (2x2 teselas)
+DEFAULT_IMAGE_TOKENS = 765
+
+# Prioridades: las peticiones interactivas pasan delante del trabajo en lote
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Pool de conexiones keep-alive compartido por todas las peticiones
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=MAX_CONCURRENT_REQUESTS,
+        max_keepalive_connections=MAX_CONCURRENT_REQUESTS,
+        keepalive_expiry=120,
+    ),
+    timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10),
+)
+
+client = None
+if azure_endpoint and api_key:
+    try:
+        client = AsyncAzureOpenAI(
+            azure_endpoint=azure_endpoint,
+            api_key=api_key,
+            api_version=api_version,
+            http_client=http_client,
+            # Los reintentos (429 / Retry-After) los gestiona el planificador
+            max_retries=0,
+        )
+        print(
+            f"Azure OpenAI Client initialized. Endpoint: {azure_endpoint}, Deployment: {deployment_name}, Version: {api_version}"
+        )
+    except Exception as e:
+        print(f"Error initializing Azure OpenAI client: {e}")
+
+
+class LLMThrottledError(HTTPException):
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail="Azure OpenAI is rate limiting requests, retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, per_minute * BUCKET_BURST_FRACTION)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # Una petición mayor que el bucket pasa cuando está lleno (queda en negativo)
+        needed = min(amount, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= amount
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int, rpm: int, tpm: int):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self._running = 0
+        self._successes = 0
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._cond: Optional[asyncio.Condition] = None
+        self.completed = 0
+        self.throttled = 0
+        self.retries = 0
+        self.waited_total = 0.0
+
+    def _condition(self) -> asyncio.Condition:
+        # Se crea en el event loop que lo usa (no al importar el módulo)
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        wait = max(0.0, self.paused_until - now)
+        if self.requests:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    async def acquire(self, tokens: int, priority: int):
+        cond = self._condition()
+        entry = (priority, next(self._seq))
+        started = time.monotonic()
+        async with cond:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    timeout = None
+                    # Solo la primera de la cola (por prioridad y llegada) puede empezar
+                    if self._queue[0] == entry and self._running < self.limit:
+                        wait = self._wait_time(tokens, time.monotonic())
+                        if wait <= 0:
+                            break
+                        timeout = wait
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                cond.notify_all()
+                raise
+            heapq.heappop(self._queue)
+            if self.requests:
+                self.requests.consume(1)
+            if self.tokens:
+                self.tokens.consume(tokens)
+            self._running += 1
+            self.waited_total += time.monotonic() - started
+            cond.notify_all()
+
+    async def release(self, throttled: bool = False, retry_after: float = 0.0, failed: bool = False):
+        cond = self._condition()
+        async with cond:
+            self._running -= 1
+            if throttled:
+                # Reducción multiplicativa y pausa global hasta Retry-After
+                self.throttled += 1
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            elif not failed:
+                # Aumento aditivo: +1 tras `limit` respuestas correctas seguidas
+                # (un error o una cancelación solo libera el cupo)
+                self.completed += 1
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            cond.notify_all()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "concurrency_limit": self.limit,
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "queued": len(self._queue),
+            "queued_interactive": sum(1 for p, _ in self._queue if p == INTERACTIVE),
+            "paused_for": round(max(0.0, self.paused_until - now), 2),
+            "rpm_available": round(self.requests.tokens, 1) if self.requests else None,
+            "tpm_available": round(self.tokens.tokens) if self.tokens else None,
+            "completed": self.completed,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "avg_wait_seconds": round(self.waited_total / (self.completed or 1), 3),
+        }
+
+
+scheduler = LLMScheduler(MAX_CONCURRENT_REQUESTS, RPM_LIMIT, TPM_LIMIT)
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int):
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+def _image_tokens(url: str) -> int:
+    try:
+        header, _, data = url.partition(",")
+        if not header.startswith("data:"):
+            return DEFAULT_IMAGE_TOKENS
+        width, height = Image.open(io.BytesIO(base64.b64decode(data))).size
+    except Exception:
+        return DEFAULT_IMAGE_TOKENS
+    return estimate_image_tokens(width, height)
+
+
+def estimate_tokens(messages: list, max_completion_tokens: int = 0) -> int:
+    # ~4 caracteres por token para el texto, imágenes por teselas
+    tokens = max_completion_tokens
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += len(content) // 4 + 4
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                tokens += len(part.get("text", "")) // 4
+            elif part.get("type") == "image_url":
+                tokens += _image_tokens(part["image_url"]["url"])
+    return tokens
+
+
+def _retry_after(error: openai.APIStatusError, attempt: int) -> float:
+    headers = error.response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+@asynccontextmanager
+async def _scheduled(create, kwargs: dict):
+    # Reserva cupo en el planificador, llama al modelo y reintenta los 429
+    tokens = estimate_tokens(kwargs.get("messages", []), kwargs.get("max_completion_tokens", 0))
+    level = _priority.get()
+    for attempt in range(MAX_RETRIES + 1):
+        with metrics.stage("llm_queue"):
+            await scheduler.acquire(tokens, level)
+        started = time.perf_counter()
+        try:
+            response = await create(**kwargs)
+        except openai.RateLimitError as e:
+            metrics.LLM_REQUESTS.inc(result="throttled")
+            retry_after = _retry_after(e, attempt)
+            await scheduler.release(throttled=True, retry_after=retry_after)
+            if attempt == MAX_RETRIES:
+                raise LLMThrottledError(math.ceil(retry_after))
+            scheduler.retries += 1
+            print(f"Azure OpenAI 429, retrying in {retry_after:.1f}s (attempt {attempt + 1}/{MAX_RETRIES})")
+            continue
+        except BaseException:
+            metrics.LLM_REQUESTS.inc(result="error")
+            await scheduler.release(failed=True)
+            raise
+        result = "error"
+        try:
+            # En streaming incluye la lectura completa de la respuesta
+            yield response
+            result = "ok"
+        except (GeneratorExit, asyncio.CancelledError):
+            # El cliente se desconectó a mitad del streaming
+            result = "cancelled"
+            raise
+        finally:
+            if result == "ok":
+                metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm")
+            metrics.LLM_REQUESTS.inc(result=result)
+            await scheduler.release(failed=result != "ok")
+        return
+
+
+async def chat_completion(**kwargs):
+    async with _scheduled(client.chat.completions.create, kwargs) as response:
+        metrics.record_usage(getattr(response, "usage", None))
+        return response
+
+
+async def stream_chat_completion(**kwargs):
+    # El cupo de concurrencia se mantiene mientras dura el streaming
+    # include_usage: el último fragmento trae response.usage (sin choices)
+    kwargs = dict(kwargs, stream=True, stream_options={"include_usage": True})
+    async with _scheduled(client.chat.completions.create, kwargs) as stream:
+        try:
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    metrics.record_usage(chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Cierra la respuesta HTTP si el consumidor abandona el streaming
+            await stream.close()
+
+
+async def close():
+    await http_client.aclose()
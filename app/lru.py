@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+# LRU en memoria para las cachés del servidor. Se acota por número de
+# entradas, por bytes o por ambos (0 = sin límite) y lleva sus propios
+# contadores de aciertos para el stats() de cada caché.
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    def __init__(self, max_items: int = 0, max_bytes: int = 0, sizeof: Callable[[V], int] = len):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._items: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: V):
+        size = self._sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None and self.max_bytes:
+                self._bytes -= self._sizeof(previous)
+            self._items[key] = value
+            self._bytes += size
+            while (self.max_items and len(self._items) > self.max_items) or (
+                self.max_bytes and self._bytes > self.max_bytes
+            ):
+                _, evicted = self._items.popitem(last=False)
+                if self.max_bytes:
+                    self._bytes -= self._sizeof(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {"items": len(self._items)}
+            if self.max_items:
+                stats["max_items"] = self.max_items
+            if self.max_bytes:
+                stats["bytes"] = self._bytes
+                stats["max_bytes"] = self.max_bytes
+            stats.update(
+                hits=self.hits,
+                misses=self.misses,
+                hit_ratio=round(self.hits / lookups, 4) if lookups else 0.0,
+            )
+            return stats
@@ -1,20 +1,41 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import hashlib
 import json
-import random
-import os
+import time
 from pathlib import Path
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, Response, HTMLResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from dotenv import load_dotenv
-from openai import AzureOpenAI
 import mimetypes
-import pdfplumber
 import base64
-import io
-import markdown
+from contextlib import aclosing, asynccontextmanager
+from app import documents, llm, metrics, question_store
+from app.jobs import JobManager
+from app.llm import (
+    LLMThrottledError,
+    chat_completion,
+    client,
+    deployment_name,
+    stream_chat_completion,
+)
+from app.markdown_render import fragment_cache, iter_readme_html
+from app.image_budget import render_budgeted_data_urls
+from app.pdf_index import file_sha256, get_page_index, save_page_indexes
+from app.question_catalog import QUESTION_FIELDS, get_catalog, legacy_questions_path
+from app.question_locator import get_question_locator
+from app.question_markdown import render_question
+from app.question_store import InvalidExamId, get_question_store
+from app.render import prune_render_cache, render_cache
+from app.singleflight import SingleFlight
+from app.responses import dumps, gzip_cache, gzip_cache_stats, json_response
+from app.static_files import StaticManifest, asset_etag_matches, choose_encoding
+from app.translation_cache import translation_cache
+from app.workers import pdf_executor, run_pdf_task
 
 # Ensure .mjs files are served with the correct MIME type
 mimetypes.add_type("application/javascript", ".mjs")
@@ -22,27 +43,25 @@ mimetypes.add_type("application/javascript", ".mjs")
 # Cargar variables de entorno
 load_dotenv()
 
-app = FastAPI()
 
-# Configurar cliente de Azure OpenAI
-azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-api_key = os.getenv("AZURE_OPENAI_API_KEY")
-deployment_name = os.getenv(
-    "AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-5.1"
-)  # Nombre del despliegue en Azure AI Studio
-api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_manager.resume_all()
+    static_manifest.load()
+    # Poda de la caché de render en segundo plano: no retrasa el arranque
+    pruning = asyncio.create_task(run_pdf_task(prune_render_cache, list(DATA_DIR.glob("*.pdf"))))
+    yield
+    await asyncio.gather(pruning, return_exceptions=True)
+    await job_manager.shutdown()
+    await llm.close()
+    pdf_executor.shutdown()
+    await asyncio.to_thread(save_page_indexes)
+    documents.close_all()
+    translation_cache.close()
+    question_store.close_all()
 
-client = None
-if azure_endpoint and api_key:
-    try:
-        client = AzureOpenAI(
-            azure_endpoint=azure_endpoint, api_key=api_key, api_version=api_version
-        )
-        print(
-            f"Azure OpenAI Client initialized. Endpoint: {azure_endpoint}, Deployment: {deployment_name}, Version: {api_version}"
-        )
-    except Exception as e:
-        print(f"Error initializing Azure OpenAI client: {e}")
+
+app = FastAPI(lifespan=lifespan)
 
 # Configurar CORS
 app.add_middleware(
@@ -51,6 +70,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Total-Count", "X-Next-Cursor"],
 )
 
 DATA_DIR = Path(__file__).parent / "data"
@@ -82,9 +102,6 @@ class TranslateRequest(BaseModel):
     text: str
 
 
-import pdfplumber
-
-
 class PageTextRequest(BaseModel):
     page_number: int
     pdf_filename: str = "az-204.pdf"
@@ -102,16 +119,17 @@ async def extract_page_text(request: PageTextRequest):
 
     try:
         text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            # pdfplumber usa índice 0, pero el usuario ve página 1
-            page_idx = request.page_number - 1
-            if 0 <= page_idx < len(pdf.pages):
-                page = pdf.pages[page_idx]
-                text = page.extract_text()
-            else:
-                raise HTTPException(status_code=400, detail="Page number out of range")
+        index = await run_pdf_task(get_page_index, pdf_path)
+        # El índice usa base 0, pero el usuario ve página 1
+        page_idx = request.page_number - 1
+        if 0 <= page_idx < index.total_pages:
+            text = await run_pdf_task(index.get_text, page_idx)
+        else:
+            raise HTTPException(status_code=400, detail="Page number out of range")
 
         return {"text": text}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error extracting text: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to extract text: {str(e)}")
@@ -125,140 +143,276 @@ class QuestionTranslationRequest(BaseModel):
     manual_end_page: Optional[int] = None
 
 
-def json_to_markdown(data: dict, pages: str, lang: str = "es") -> str:
-    title = "Pregunta" if lang == "es" else "Question"
-    pages_label = "Páginas" if lang == "es" else "Pages"
-    summary_label = "Resumen" if lang == "es" else "Summary"
-    answer_label = "Respuesta Correcta" if lang == "es" else "Correct Answer"
-
-    md = f"## {title} {data.get('id_question')} ({pages_label} {pages})\n\n"
-    md += f"**{summary_label}**\n\n{data.get('short_question')}\n\n"
-    md += f"**{answer_label}**\n\n{data.get('correct_answer')}"
-    return md
-
-
-def json_to_markdown_full(data: dict, pages: str, lang: str) -> str:
-    # Header
-    title = "Pregunta" if lang == "es" else "Question"
-    md = f"## {title} {data.get('id_question')} (Pages {pages})\n\n"
-
-    # Context / Full Question
-    context_title = "Contexto" if lang == "es" else "Context"
-    md += f"**{context_title}**\n\n{data.get('question_context')}\n\n"
-
-    # Image Explanation (if present)
-    img_exp = data.get("image_explanation")
-    if img_exp:
-        img_title = "Explicación de la Imagen" if lang == "es" else "Image Explanation"
-        md += f"**{img_title}**\n\n{img_exp}\n\n"
-
-    # Options
-    options_title = "Opciones" if lang == "es" else "Options"
-    md += f"**{options_title}**\n\n"
-    for opt in data.get("options", []):
-        check = "(Correcta)" if opt.get("is_correct") else ""
-        if lang == "en":
-            check = "(Correct)" if opt.get("is_correct") else ""
-        md += f"- **{opt.get('letter')}**: {opt.get('text')} {check}\n"
-    md += "\n"
-
-    # Correct Answer
-    ans_title = "Respuesta Correcta" if lang == "es" else "Correct Answer"
-    md += f"**{ans_title}**\n\n{data.get('correct_answer')}\n\n"
-
-    # Explanation
-    exp_title = "Explicación" if lang == "es" else "Explanation"
-    md += f"**{exp_title}**\n\n{data.get('explanation')}\n\n"
-
-    # Community Discussion
-    comm_disc = data.get("community_discussion")
-    if comm_disc:
-        comm_title = (
-            "Discusión de la Comunidad" if lang == "es" else "Community Discussion"
+# Versión del prompt de extracción de preguntas: forma parte de la clave de la
+# caché de respuestas crudas del modelo
+QUESTION_PROMPT_VERSION = 1
+
+
+def extraction_key(
+    pdf_sha256: str, question_number: int, start_page_idx: int, end_page_idx: int
+) -> str:
+    raw = (
+        f"{pdf_sha256}\0{question_number}\0{start_page_idx + 1}-{end_page_idx + 1}"
+        f"\0{QUESTION_PROMPT_VERSION}\0{deployment_name}"
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+translation_flights = SingleFlight("translate-question")
+
+
+def saved_question_response(store, question_number: int) -> Optional[dict]:
+    saved_es = store.get("es", question_number)
+    if saved_es is None:
+        return None
+
+    saved_en = store.get("en", question_number) or {}
+    if saved_es["start_page"] and saved_es["end_page"]:
+        pages_from_json = f"{saved_es['start_page']}-{saved_es['end_page']}"
+    else:
+        pages_from_json = saved_es["data"].get("pages", "Unknown")
+
+    return {
+        "markdown": saved_es["markdown"],
+        "markdown_full": saved_es["markdown_full"],
+        "markdown_en": saved_en.get("markdown", ""),
+        "markdown_full_en": saved_en.get("markdown_full", ""),
+        "pages_processed": pages_from_json,
+        "saved": True,
+    }
+
+
+async def request_extraction(
+    pdf_path: Path, question_number: int, start_page_idx: int, end_page_idx: int
+) -> tuple:
+    # Convertir páginas a imágenes
+    # Prompt refinado para solicitar JSON
+    prompt_text = (
+        f"Analyze 'Question #{question_number}' from the provided images (pages {start_page_idx + 1}-{end_page_idx + 1}). "
+        "1. Identify the question text, options, and official answer.\n"
+        "2. Look for a 'Community Discussion' section. If present, extract the key points and determine if the community suggests a different answer than the official one.\n"
+        "3. Create a summary of the question ('short_question').\n"
+        "4. If there are images or diagrams, provide a detailed description/explanation of them in the English section ('image_explanation').\n"
+        "5. Provide the output in TWO languages: English ('en') and Spanish ('es').\n"
+        "IMPORTANT: When translating to Spanish, KEEP technical terms (like 'Azure Functions', 'Blob Storage', 'VNet', etc.) in ENGLISH. Do not translate them.\n"
+        "Return ONLY a valid JSON object with the following structure:\n"
+        "{\n"
+        '  "en": {\n'
+        f'    "id_question": {question_number},\n'
+        f'    "start_page": {start_page_idx + 1},\n'
+        f'    "end_page": {end_page_idx + 1},\n'
+        '    "short_question": "Summary of the question",\n'
+        '    "question_context": "Full question text",\n'
+        '    "image_explanation": "Detailed description of any images/diagrams (if present, else null)",\n'
+        '    "community_discussion": "Summary of the community discussion if present, else null",\n'
+        '    "options": [\n'
+        '      {"letter": "A", "text": "Option text", "is_correct_pdf": boolean, "is_correct_community": boolean|null, "is_correct": boolean}\n'
+        "    ],\n"
+        '    "correct_answer": "The correct option letter and text",\n'
+        '    "explanation": "Detailed explanation"\n'
+        "  },\n"
+        '  "es": {\n'
+        f'    "id_question": {question_number},\n'
+        f'    "start_page": {start_page_idx + 1},\n'
+        f'    "end_page": {end_page_idx + 1},\n'
+        '    "short_question": "Resumen de la pregunta en español (mantener términos técnicos en inglés)",\n'
+        '    "question_context": "Texto completo de la pregunta en español. Incluye aquí la descripción de diagramas/imágenes si las hay. (mantener términos técnicos en inglés)",\n'
+        '    "community_discussion": "Resumen de la discusión de la comunidad en español si existe, sino null",\n'
+        '    "options": [\n'
+        '      {"letter": "A", "text": "Texto de la opción en español (mantener términos técnicos en inglés)", "is_correct_pdf": boolean, "is_correct_community": boolean|null, "is_correct": boolean}\n'
+        "    ],\n"
+        '    "correct_answer": "Letra y texto de la respuesta correcta en español",\n'
+        '    "explanation": "Explicación detallada en español (mantener términos técnicos en inglés)"\n'
+        "  }\n"
+        "}\n"
+        "Do not include markdown formatting (like ```json) around the output. Just the raw JSON string."
+    )
+
+    content_payload = [{"type": "text", "text": prompt_text}]
+
+    # Recorte al contenido y resolución por página según el presupuesto de
+    # píxeles, con 200 DPI como máximo para el OCR de diagramas
+    image_urls = await run_pdf_task(
+        render_budgeted_data_urls,
+        pdf_path,
+        list(range(start_page_idx, end_page_idx + 1)),
+        200,
+    )
+    for image_url in image_urls:
+        content_payload.append(
+            {
+                "type": "image_url",
+                "image_url": {"url": image_url},
+            }
         )
-        md += f"**{comm_title}**\n\n{comm_disc}\n\n"
 
-    return md
+    # 3. Enviar a Azure OpenAI
+    translation_json_str = None
+    try:
+        response = await chat_completion(
+            model=deployment_name,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an expert technical instructor. You extract exam questions from images and return them in structured JSON format translated to Spanish. IMPORTANT: Keep technical terms in English.",
+                },
+                {"role": "user", "content": content_payload},
+            ],
+            max_completion_tokens=8000,
+            response_format={"type": "json_object"},
+        )
+        translation_json_str = response.choices[0].message.content
+    except LLMThrottledError:
+        raise
+    except Exception as e:
+        # If json_object format fails, retry without strict format
+        print(f"⚠️ First attempt with json_object format failed: {e}")
+        print("Retrying without strict JSON format...")
+
+        response = await chat_completion(
+            model=deployment_name,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an expert technical instructor. You extract exam questions from images and return them in structured JSON format translated to Spanish. IMPORTANT: Keep technical terms in English. Return ONLY valid JSON, no markdown formatting.",
+                },
+                {"role": "user", "content": content_payload},
+            ],
+            max_completion_tokens=8000,
+        )
+        translation_json_str = response.choices[0].message.content
+
+    # Debug: Log response length and first 500 chars
+    print(f"Response length: {len(translation_json_str) if translation_json_str else 0}")
+    print(f"Finish reason: {response.choices[0].finish_reason}")
+
+    if translation_json_str:
+        print(f"Response preview: {translation_json_str[:500]}")
+    else:
+        print("⚠️ Empty response from Azure OpenAI")
+        print(f"Response object: {response}")
+        if hasattr(response.choices[0], 'content_filter_results'):
+            print(f"Content filter results: {response.choices[0].content_filter_results}")
+        raise ValueError("Empty response from Azure OpenAI - check content filters or token limits")
+
+    return translation_json_str, response.choices[0].finish_reason
+
+
+async def extract_question(
+    store, pdf_path: Path, question_number: int, start_page_idx: int, end_page_idx: int
+) -> dict:
+    # Otra ejecución pudo guardar la pregunta justo antes de entrar aquí
+    saved = await run_in_threadpool(saved_question_response, store, question_number)
+    if saved is not None:
+        return saved
+
+    # 2. Respuesta cruda ya obtenida para este PDF, rango, prompt y deployment
+    pdf_sha256 = await run_pdf_task(file_sha256, pdf_path)
+    cache_key = extraction_key(pdf_sha256, question_number, start_page_idx, end_page_idx)
+    translation_json_str = await run_in_threadpool(store.get_extraction, cache_key)
+    finish_reason = None
+    from_cache = translation_json_str is not None
+    metrics.cache_result("llm_extraction", from_cache)
+    if from_cache:
+        print(f"Using stored extraction for question #{question_number} ({cache_key[:12]})")
+    else:
+        translation_json_str, finish_reason = await request_extraction(
+            pdf_path, question_number, start_page_idx, end_page_idx
+        )
+
+    try:
+        full_data = json.loads(translation_json_str)
+        data_en = full_data.get("en")
+        data_es = full_data.get("es")
+
+        if not data_en or not data_es:
+            raise ValueError("Missing 'en' or 'es' keys in response")
+
+    except json.JSONDecodeError as e:
+        print(f"JSON decode error: {str(e)}")
+        print(f"Full response: {translation_json_str[:2000]}")
+
+        # Fallback if model returns markdown code block
+        if "```json" in translation_json_str:
+            translation_json_str = (
+                translation_json_str.split("```json")[1].split("```")[0].strip()
+            )
+            full_data = json.loads(translation_json_str)
+            data_en = full_data.get("en")
+            data_es = full_data.get("es")
+        else:
+            raise ValueError(f"Could not parse JSON response: {str(e)}")
+
+    # Solo se guardan respuestas que se pudieron interpretar
+    if not from_cache:
+        with metrics.stage("file_write"):
+            await run_in_threadpool(
+                store.put_extraction,
+                cache_key,
+                pdf_sha256,
+                question_number,
+                start_page_idx + 1,
+                end_page_idx + 1,
+                QUESTION_PROMPT_VERSION,
+                deployment_name,
+                translation_json_str,
+                finish_reason,
+            )
+
+    # 4. Generate Markdown (from Spanish and English data)
+    pages_str = f"{start_page_idx+1}-{end_page_idx+1}"
+    es = render_question(data_es, pages_str, "es")
+    en = render_question(data_en, pages_str, "en")
+    markdown_es, markdown_es_full, _ = es
+    markdown_en, markdown_en_full, _ = en
+
+    # 5. Save JSONs and Markdowns (una sola transacción)
+    with metrics.stage("file_write"):
+        await run_in_threadpool(
+            store.save, question_number, {"en": (data_en, *en), "es": (data_es, *es)}
+        )
+
+    return {
+        "markdown": markdown_es,
+        "markdown_full": markdown_es_full,
+        "markdown_en": markdown_en,
+        "markdown_full_en": markdown_en_full,
+        "pages_processed": pages_str,
+        "saved": True,
+    }
+
+
+def flight_key(key: tuple) -> tuple:
+    # La ejecución compartida corre con la prioridad de quien la inició. Una
+    # petición interactiva no se une a una de un trabajo en lote (esperaría en
+    # la cola BACKGROUND del modelo); un trabajo en lote sí aprovecha una
+    # interactiva en curso.
+    level = llm.current_priority()
+    if level != llm.INTERACTIVE and translation_flights.in_flight(key + (llm.INTERACTIVE,)):
+        level = llm.INTERACTIVE
+    return key + (level,)
 
 
 @app.post("/translate-question")
 async def translate_question(request: QuestionTranslationRequest):
+    if not request.question_number.isdigit():
+        raise HTTPException(status_code=400, detail="question_number must be a number")
+
+    started = time.perf_counter()
     exam_id = Path(request.pdf_filename).stem
-    json_en_dir = DATA_DIR / exam_id / "questions_json" / "en"
-    json_es_dir = DATA_DIR / exam_id / "questions_json" / "es"
-
-    # Markdown directories separated by language
-    md_en_dir = DATA_DIR / exam_id / "questions_md" / "en"
-    md_es_dir = DATA_DIR / exam_id / "questions_md" / "es"
-
-    # Ensure directories exist
-    json_en_dir.mkdir(parents=True, exist_ok=True)
-    json_es_dir.mkdir(parents=True, exist_ok=True)
-    md_en_dir.mkdir(parents=True, exist_ok=True)
-    md_es_dir.mkdir(parents=True, exist_ok=True)
-
-    json_en_path = json_en_dir / f"{request.question_number}.json"
-    json_es_path = json_es_dir / f"{request.question_number}.json"
-
-    # Define paths for all 4 markdown files
-    md_es_path = md_es_dir / f"{request.question_number}.md"
-    md_es_full_path = md_es_dir / f"{request.question_number}_full.md"
-    md_en_path = md_en_dir / f"{request.question_number}.md"
-    md_en_full_path = md_en_dir / f"{request.question_number}_full.md"
-
-    # 0. Check if question is already saved (checking Spanish JSON and MD)
-    if json_es_path.exists() and md_es_path.exists():
-        try:
-            # Read all 4 files if they exist, otherwise return what we have or regenerate
-            # For simplicity, if the main ES markdown exists, we assume others might too or we just return it.
-            # But to be robust, let's try to read all.
-
-            saved_md_es = ""
-            saved_md_es_full = ""
-            saved_md_en = ""
-            saved_md_en_full = ""
-            pages_from_json = "Unknown"
-
-            # Try to extract pages from JSON
-            if json_es_path.exists():
-                with open(json_es_path, "r", encoding="utf-8") as f:
-                    json_data = json.load(f)
-                    start_page = json_data.get("start_page")
-                    end_page = json_data.get("end_page")
-                    if start_page and end_page:
-                        pages_from_json = f"{start_page}-{end_page}"
-                    else:
-                        # Fallback para archivos antiguos con el campo 'pages'
-                        pages_from_json = json_data.get("pages", "Unknown")
-                    end_page = json_data.get("end_page")
-                    if start_page and end_page:
-                        pages_from_json = f"{start_page}-{end_page}"
-                    else:
-                        pages_from_json = json_data.get("pages", "Unknown")
-
-            if md_es_path.exists():
-                with open(md_es_path, "r", encoding="utf-8") as f:
-                    saved_md_es = f.read()
-            if md_es_full_path.exists():
-                with open(md_es_full_path, "r", encoding="utf-8") as f:
-                    saved_md_es_full = f.read()
-            if md_en_path.exists():
-                with open(md_en_path, "r", encoding="utf-8") as f:
-                    saved_md_en = f.read()
-            if md_en_full_path.exists():
-                with open(md_en_full_path, "r", encoding="utf-8") as f:
-                    saved_md_en_full = f.read()
-
-            return {
-                "markdown": saved_md_es,
-                "markdown_full": saved_md_es_full,
-                "markdown_en": saved_md_en,
-                "markdown_full_en": saved_md_en_full,
-                "pages_processed": pages_from_json,
-                "saved": True,
-            }
-        except Exception as e:
-            print(f"Error reading saved files: {e}")
+    question_number = int(request.question_number)
+    try:
+        store = await run_in_threadpool(get_question_store, exam_id)
+    except InvalidExamId as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 0. Check if question is already saved (consulta indexada al almacén).
+    # SQLite es bloqueante: las consultas al almacén corren en el threadpool
+    saved = await run_in_threadpool(saved_question_response, store, question_number)
+    metrics.cache_result("question_store", saved is not None)
+    if saved is not None:
+        metrics.TRANSLATE_QUESTION_SECONDS.observe(time.perf_counter() - started, outcome="saved")
+        return saved
 
     if not client:
         raise HTTPException(
@@ -285,259 +439,222 @@ async def translate_question(request: QuestionTranslationRequest):
             end_page_idx = request.manual_end_page - 1
 
             # Validaciones básicas
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-                if (
-                    start_page_idx < 0
-                    or end_page_idx >= total_pages
-                    or start_page_idx > end_page_idx
-                ):
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid page range. PDF has {total_pages} pages.",
-                    )
+            with metrics.stage("page_search"):
+                total_pages = (await run_pdf_task(get_page_index, pdf_path)).total_pages
+            if (
+                start_page_idx < 0
+                or end_page_idx >= total_pages
+                or start_page_idx > end_page_idx
+            ):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid page range. PDF has {total_pages} pages.",
+                )
         else:
-            # 1. Buscar la pregunta en el PDF (Lógica automática existente)
-            with pdfplumber.open(pdf_path) as pdf:
-                q_pattern = f"Question #{request.question_number}"
-                next_q_pattern = f"Question #{int(request.question_number) + 1}"
-
-                # Buscar página de inicio
-                # Empezamos buscando desde la pista (hint) para eficiencia, si no, desde el principio
-                # Lógica basada en analyze_pages: saltar las primeras 17 páginas (índice)
-                INDEX_PAGES_SKIP = 17
-                total_pages = len(pdf.pages)
-                
-                start_search_idx = max(INDEX_PAGES_SKIP, request.start_page_hint - 1)
-                
-                # Primero buscamos desde el hint (o 17) hasta el final
-                search_order = list(range(start_search_idx, total_pages))
-                
-                # Si el hint estaba más adelante, buscamos en el hueco entre 17 y el hint
-                if start_search_idx > INDEX_PAGES_SKIP:
-                    search_order += list(range(INDEX_PAGES_SKIP, start_search_idx))
-                
-                # NOTA: No buscamos en 0..16 porque son el índice y dan falsos positivos
-
-                for i in search_order:
-                    text = pdf.pages[i].extract_text() or ""
-                    if q_pattern in text:
-                        start_page_idx = i
-                        break
-
-                if start_page_idx == -1:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Question #{request.question_number} not found in PDF. Try specifying the page range manually.",
-                    )
-
-                # Buscar página final (donde empieza la siguiente pregunta o un límite razonable)
-                end_page_idx = start_page_idx
-                # Para casos de estudio, necesitamos buscar más páginas adelante (hasta 10)
-                # Buscamos hasta encontrar la siguiente pregunta o hasta 10 páginas adelante
-                max_search_pages = 10
-                found_next = False
-                
-                for i in range(start_page_idx + 1, min(start_page_idx + max_search_pages + 1, len(pdf.pages))):
-                    text = pdf.pages[i].extract_text() or ""
-                    if next_q_pattern in text:
-                        # Encontramos la siguiente pregunta
-                        # La pregunta actual termina en la página anterior
-                        end_page_idx = i - 1
-                        found_next = True
-                        break
-                
-                # Si no encontramos la siguiente pregunta, buscamos la página con opciones
-                if not found_next:
-                    # Buscamos hacia atrás desde la última página buscada para encontrar donde están las opciones
-                    for i in range(min(start_page_idx + max_search_pages, len(pdf.pages) - 1), start_page_idx, -1):
-                        text = pdf.pages[i].extract_text() or ""
-                        # Si la página tiene opciones múltiples (A, B, C, D) y "Correct Answer" o "Explanation"
-                        if ("A)" in text and "B)" in text and "C)" in text) or "Correct Answer" in text or "Explanation" in text:
-                            end_page_idx = i
-                            break
-                    
-                    # Si no encontramos opciones, asumimos 7 páginas (típico para casos de estudio)
-                    if end_page_idx == start_page_idx:
-                        end_page_idx = min(start_page_idx + 7, len(pdf.pages) - 1)
-
-        # 2. Convertir páginas a imágenes
-        # Prompt refinado para solicitar JSON
-        prompt_text = (
-            f"Analyze 'Question #{request.question_number}' from the provided images (pages {start_page_idx + 1}-{end_page_idx + 1}). "
-            "1. Identify the question text, options, and official answer.\n"
-            "2. Look for a 'Community Discussion' section. If present, extract the key points and determine if the community suggests a different answer than the official one.\n"
-            "3. Create a summary of the question ('short_question').\n"
-            "4. If there are images or diagrams, provide a detailed description/explanation of them in the English section ('image_explanation').\n"
-            "5. Provide the output in TWO languages: English ('en') and Spanish ('es').\n"
-            "IMPORTANT: When translating to Spanish, KEEP technical terms (like 'Azure Functions', 'Blob Storage', 'VNet', etc.) in ENGLISH. Do not translate them.\n"
-            "Return ONLY a valid JSON object with the following structure:\n"
-            "{\n"
-            '  "en": {\n'
-            f'    "id_question": {request.question_number},\n'
-            f'    "start_page": {start_page_idx + 1},\n'
-            f'    "end_page": {end_page_idx + 1},\n'
-            '    "short_question": "Summary of the question",\n'
-            '    "question_context": "Full question text",\n'
-            '    "image_explanation": "Detailed description of any images/diagrams (if present, else null)",\n'
-            '    "community_discussion": "Summary of the community discussion if present, else null",\n'
-            '    "options": [\n'
-            '      {"letter": "A", "text": "Option text", "is_correct_pdf": boolean, "is_correct_community": boolean|null, "is_correct": boolean}\n'
-            "    ],\n"
-            '    "correct_answer": "The correct option letter and text",\n'
-            '    "explanation": "Detailed explanation"\n'
-            "  },\n"
-            '  "es": {\n'
-            f'    "id_question": {request.question_number},\n'
-            f'    "start_page": {start_page_idx + 1},\n'
-            f'    "end_page": {end_page_idx + 1},\n'
-            '    "short_question": "Resumen de la pregunta en español (mantener términos técnicos en inglés)",\n'
-            '    "question_context": "Texto completo de la pregunta en español. Incluye aquí la descripción de diagramas/imágenes si las hay. (mantener términos técnicos en inglés)",\n'
-            '    "community_discussion": "Resumen de la discusión de la comunidad en español si existe, sino null",\n'
-            '    "options": [\n'
-            '      {"letter": "A", "text": "Texto de la opción en español (mantener términos técnicos en inglés)", "is_correct_pdf": boolean, "is_correct_community": boolean|null, "is_correct": boolean}\n'
-            "    ],\n"
-            '    "correct_answer": "Letra y texto de la respuesta correcta en español",\n'
-            '    "explanation": "Explicación detallada en español (mantener términos técnicos en inglés)"\n'
-            "  }\n"
-            "}\n"
-            "Do not include markdown formatting (like ```json) around the output. Just the raw JSON string."
+            # 1. Buscar la pregunta en el localizador (una sola pasada sobre el PDF)
+            with metrics.stage("page_search"):
+                locator = await run_pdf_task(get_question_locator, pdf_path)
+                page_range = locator.lookup(question_number)
+            if page_range is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Question #{request.question_number} not found in PDF. Try specifying the page range manually.",
+                )
+            start_page_idx, end_page_idx = page_range
+
+        # 2. Una sola ejecución por (pdf, pregunta, rango): las peticiones
+        # simultáneas esperan el resultado de la primera
+        key = (str(pdf_path.resolve()), question_number, start_page_idx, end_page_idx)
+        response = await translation_flights.do(
+            flight_key(key),
+            lambda: extract_question(
+                store, pdf_path, question_number, start_page_idx, end_page_idx
+            ),
         )
+        metrics.TRANSLATE_QUESTION_SECONDS.observe(time.perf_counter() - started, outcome="extracted")
+        return response
 
-        content_payload = [{"type": "text", "text": prompt_text}]
+    except HTTPException:
+        metrics.TRANSLATE_QUESTION_SECONDS.observe(time.perf_counter() - started, outcome="error")
+        raise
+    except Exception as e:
+        metrics.TRANSLATE_QUESTION_SECONDS.observe(time.perf_counter() - started, outcome="error")
+        print(f"Translation error: {e}")
+        raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
-        with pdfplumber.open(pdf_path) as pdf:
-            for i in range(start_page_idx, end_page_idx + 1):
-                page = pdf.pages[i]
-                # Aumentamos un poco la resolución para mejor OCR de diagramas
-                im = page.to_image(resolution=200)
-                img_byte_arr = io.BytesIO()
-                im.original.save(img_byte_arr, format="PNG")
-                b64_img = base64.b64encode(img_byte_arr.getvalue()).decode("utf-8")
 
-                content_payload.append(
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/png;base64,{b64_img}"},
-                    }
-                )
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-        # 3. Enviar a Azure OpenAI
-        translation_json_str = None
-        try:
-            response = client.chat.completions.create(
-                model=deployment_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert technical instructor. You extract exam questions from images and return them in structured JSON format translated to Spanish. IMPORTANT: Keep technical terms in English.",
-                    },
-                    {"role": "user", "content": content_payload},
-                ],
-                max_completion_tokens=8000,
-                response_format={"type": "json_object"},
-            )
-            translation_json_str = response.choices[0].message.content
-        except Exception as e:
-            # If json_object format fails, retry without strict format
-            print(f"⚠️ First attempt with json_object format failed: {e}")
-            print("Retrying without strict JSON format...")
-            
-            response = client.chat.completions.create(
-                model=deployment_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert technical instructor. You extract exam questions from images and return them in structured JSON format translated to Spanish. IMPORTANT: Keep technical terms in English. Return ONLY valid JSON, no markdown formatting.",
-                    },
-                    {"role": "user", "content": content_payload},
-                ],
-                max_completion_tokens=8000,
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class TranslationJobRequest(BaseModel):
+    pdf_filename: str = "az-204.pdf"
+    start_question: int
+    end_question: int
+    concurrency: int = 4
+
+
+async def _translate_for_job(pdf_filename: str, question_number: int) -> dict:
+    # Trabajo en lote: cede el turno del modelo a las peticiones interactivas
+    with llm.priority(llm.BACKGROUND):
+        return await translate_question(
+            QuestionTranslationRequest(
+                question_number=str(question_number), pdf_filename=pdf_filename
             )
-            translation_json_str = response.choices[0].message.content
-        
-        # Debug: Log response length and first 500 chars
-        print(f"Response length: {len(translation_json_str) if translation_json_str else 0}")
-        print(f"Finish reason: {response.choices[0].finish_reason}")
-        
-        if translation_json_str:
-            print(f"Response preview: {translation_json_str[:500]}")
-        else:
-            print("⚠️ Empty response from Azure OpenAI")
-            print(f"Response object: {response}")
-            if hasattr(response.choices[0], 'content_filter_results'):
-                print(f"Content filter results: {response.choices[0].content_filter_results}")
-            raise ValueError("Empty response from Azure OpenAI - check content filters or token limits")
-        
-        try:
-            full_data = json.loads(translation_json_str)
-            data_en = full_data.get("en")
-            data_es = full_data.get("es")
+        )
 
-            if not data_en or not data_es:
-                raise ValueError("Missing 'en' or 'es' keys in response")
-
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {str(e)}")
-            print(f"Full response: {translation_json_str[:2000]}")
-            
-            # Fallback if model returns markdown code block
-            if "```json" in translation_json_str:
-                translation_json_str = (
-                    translation_json_str.split("```json")[1].split("```")[0].strip()
-                )
-                full_data = json.loads(translation_json_str)
-                data_en = full_data.get("en")
-                data_es = full_data.get("es")
-            else:
-                raise ValueError(f"Could not parse JSON response: {str(e)}")
 
-        # 4. Generate Markdown (from Spanish and English data)
-        pages_str = f"{start_page_idx+1}-{end_page_idx+1}"
+def _is_translated(pdf_filename: str, question_number: int) -> bool:
+    try:
+        store = get_question_store(Path(pdf_filename).stem)
+    except InvalidExamId:
+        return False
+    return store.exists("es", question_number)
 
-        # Spanish Markdowns
-        markdown_es = json_to_markdown(data_es, pages_str, "es")
-        markdown_es_full = json_to_markdown_full(data_es, pages_str, "es")
 
-        # English Markdowns
-        markdown_en = json_to_markdown(data_en, pages_str, "en")
-        markdown_en_full = json_to_markdown_full(data_en, pages_str, "en")
+job_manager = JobManager(DATA_DIR / ".jobs", _translate_for_job, _is_translated)
 
-        # 5. Save JSONs and Markdowns
-        with open(json_en_path, "w", encoding="utf-8") as f:
-            json.dump(data_en, f, indent=2, ensure_ascii=False)
 
-        with open(json_es_path, "w", encoding="utf-8") as f:
-            json.dump(data_es, f, indent=2, ensure_ascii=False)
+@app.post("/jobs/translate")
+async def create_translation_job(request: TranslationJobRequest):
+    if not client:
+        raise HTTPException(
+            status_code=503, detail="Azure OpenAI service not configured"
+        )
+
+    try:
+        get_question_store(Path(request.pdf_filename).stem)
+    except InvalidExamId as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not (DATA_DIR / request.pdf_filename).exists():
+        raise HTTPException(
+            status_code=404, detail=f"PDF file not found: {request.pdf_filename}"
+        )
 
-        with open(md_es_path, "w", encoding="utf-8") as f:
-            f.write(markdown_es)
+    if request.start_question < 1 or request.start_question > request.end_question:
+        raise HTTPException(status_code=400, detail="Invalid question range")
 
-        with open(md_es_full_path, "w", encoding="utf-8") as f:
-            f.write(markdown_es_full)
+    if not 1 <= request.concurrency <= 16:
+        raise HTTPException(status_code=400, detail="concurrency must be between 1 and 16")
 
-        with open(md_en_path, "w", encoding="utf-8") as f:
-            f.write(markdown_en)
+    job = job_manager.create(
+        request.pdf_filename,
+        request.start_question,
+        request.end_question,
+        request.concurrency,
+    )
+    return job.snapshot()
 
-        with open(md_en_full_path, "w", encoding="utf-8") as f:
-            f.write(markdown_en_full)
 
-        return {
-            "markdown": markdown_es,
-            "markdown_full": markdown_es_full,
-            "markdown_en": markdown_en,
-            "markdown_full_en": markdown_en_full,
-            "pages_processed": pages_str,
-            "saved": True,
-        }
+@app.get("/jobs")
+async def list_translation_jobs():
+    return [job.snapshot() for job in job_manager.jobs.values()]
 
-    except Exception as e:
-        print(f"Translation error: {e}")
-        raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
+def _get_job(job_id: str):
+    job = job_manager.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
 
-@app.post("/translate-page-image")
-async def translate_page_image(request: PageTextRequest):
+
+@app.get("/jobs/{job_id}")
+async def get_translation_job(job_id: str):
+    return _get_job(job_id).snapshot()
+
+
+@app.get("/jobs/{job_id}/events")
+async def translation_job_events(job_id: str):
+    job = _get_job(job_id)
+    return sse_response(job_manager.events(job))
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_translation_job(job_id: str):
+    job = _get_job(job_id)
+    job_manager.cancel(job)
+    return job.snapshot()
+
+
+def page_image_messages(image_url: str) -> list:
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant that translates technical documentation from English to Spanish. The user provides an image of a PDF page. Translate the content (text, diagrams, code comments) to Spanish. Use markdown for formatting. If there is code, keep it as is but translate comments if possible. IMPORTANT: Keep technical terms in English.",
+        },
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Translate this page to Spanish."},
+                {
+                    "type": "image_url",
+                    "image_url": {"url": image_url},
+                },
+            ],
+        },
+    ]
+
+
+# Subir la versión al cambiar el prompt de /translate invalida la caché
+TRANSLATE_PROMPT_VERSION = 1
+
+
+def translate_text_messages(text: str) -> list:
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant that translates technical text from English to Spanish. Maintain technical terms in English but ensure the translation is natural and accurate.",
+        },
+        {
+            "role": "user",
+            "content": f"Translate the following text to Spanish:\n\n{text}",
+        },
+    ]
+
+
+def stream_translation(
+    messages: list, max_completion_tokens: int, on_done=None
+) -> StreamingResponse:
+    # SSE: un evento por fragmento de texto ({"delta": ...}) y un evento
+    # final 'done' con la traducción completa, o 'error' si el modelo falla.
+    async def events():
+        parts = []
+        try:
+            # aclosing: si el cliente se desconecta, el streaming del modelo se
+            # cierra ya y no cuando el recolector finalice el generador
+            async with aclosing(
+                stream_chat_completion(
+                    model=deployment_name,
+                    messages=messages,
+                    max_completion_tokens=max_completion_tokens,
+                )
+            ) as deltas:
+                async for delta in deltas:
+                    parts.append(delta)
+                    yield sse_event({"delta": delta})
+        except Exception as e:
+            print(f"Translation error: {e}")
+            yield sse_event({"detail": f"Translation failed: {str(e)}"}, "error")
+            return
+        translation = "".join(parts)
+        if on_done:
+            await run_in_threadpool(on_done, translation)
+        yield sse_event({"translation": translation}, "done")
+
+    return sse_response(events())
+
+
+async def render_page_for_translation(request: PageTextRequest) -> str:
     if not client:
         raise HTTPException(
             status_code=503, detail="Azure OpenAI service not configured"
@@ -551,85 +668,236 @@ async def translate_page_image(request: PageTextRequest):
             status_code=404, detail=f"PDF file not found: {request.pdf_filename}"
         )
 
+    index = await run_pdf_task(get_page_index, pdf_path)
+    page_idx = request.page_number - 1
+    if not 0 <= page_idx < index.total_pages:
+        raise HTTPException(status_code=400, detail="Page number out of range")
+
+    # Renderizar página a imagen recortada al contenido (máximo 150 DPI)
+    (image_url,) = await run_pdf_task(render_budgeted_data_urls, pdf_path, [page_idx], 150)
+    return image_url
+
+
+@app.post("/translate-page-image")
+async def translate_page_image(request: PageTextRequest):
     try:
-        base64_image = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            page_idx = request.page_number - 1
-            if 0 <= page_idx < len(pdf.pages):
-                page = pdf.pages[page_idx]
-                # Renderizar página a imagen (resolución 150 DPI es un buen balance)
-                im = page.to_image(resolution=150)
-                img_byte_arr = io.BytesIO()
-                im.original.save(img_byte_arr, format="PNG")
-                img_byte_arr = img_byte_arr.getvalue()
-                base64_image = base64.b64encode(img_byte_arr).decode("utf-8")
-            else:
-                raise HTTPException(status_code=400, detail="Page number out of range")
-
-        response = client.chat.completions.create(
+        image_url = await render_page_for_translation(request)
+
+        response = await chat_completion(
             model=deployment_name,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that translates technical documentation from English to Spanish. The user provides an image of a PDF page. Translate the content (text, diagrams, code comments) to Spanish. Use markdown for formatting. If there is code, keep it as is but translate comments if possible. IMPORTANT: Keep technical terms in English.",
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Translate this page to Spanish."},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
-                            },
-                        },
-                    ],
-                },
-            ],
+            messages=page_image_messages(image_url),
             max_completion_tokens=2000,
         )
         translation = response.choices[0].message.content
         return {"translation": translation}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Translation error: {e}")
         raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
 
+@app.post("/translate-page-image/stream")
+async def translate_page_image_stream(request: PageTextRequest):
+    try:
+        image_url = await render_page_for_translation(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Translation error: {e}")
+        raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
+
+    return stream_translation(page_image_messages(image_url), 2000)
+
+
+def cache_translation(request: TranslateRequest, cache_key: str, translation: str):
+    if translation:
+        translation_cache.put(
+            cache_key, request.text, deployment_name, TRANSLATE_PROMPT_VERSION, translation
+        )
+
+
 @app.post("/translate")
 async def translate_text(request: TranslateRequest):
+    cache_key = translation_cache.make_key(
+        request.text, deployment_name, TRANSLATE_PROMPT_VERSION
+    )
+    # Un fallo de memoria consulta SQLite: se hace en el threadpool
+    cached = await run_in_threadpool(translation_cache.get, cache_key)
+    if cached is not None:
+        return {"translation": cached}
+
     if not client:
         raise HTTPException(
             status_code=503, detail="Azure OpenAI service not configured"
         )
 
     try:
-        response = client.chat.completions.create(
+        response = await chat_completion(
             model=deployment_name,  # Usar la variable de entorno
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that translates technical text from English to Spanish. Maintain technical terms in English but ensure the translation is natural and accurate.",
-                },
-                {
-                    "role": "user",
-                    "content": f"Translate the following text to Spanish:\n\n{request.text}",
-                },
-            ],
+            messages=translate_text_messages(request.text),
             max_completion_tokens=2000,
         )
         translation = response.choices[0].message.content
+        await run_in_threadpool(cache_translation, request, cache_key, translation)
         return {"translation": translation}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Translation error: {e}")
         raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
 
+@app.post("/translate/stream")
+async def translate_text_stream(request: TranslateRequest):
+    cache_key = translation_cache.make_key(
+        request.text, deployment_name, TRANSLATE_PROMPT_VERSION
+    )
+    cached = await run_in_threadpool(translation_cache.get, cache_key)
+    if cached is not None:
+
+        async def cached_events():
+            yield sse_event({"delta": cached})
+            yield sse_event({"translation": cached}, "done")
+
+        return sse_response(cached_events())
+
+    if not client:
+        raise HTTPException(
+            status_code=503, detail="Azure OpenAI service not configured"
+        )
+
+    return stream_translation(
+        translate_text_messages(request.text),
+        2000,
+        on_done=lambda translation: cache_translation(request, cache_key, translation),
+    )
+
+
 @app.get("/health")
 def health_check():
     return {"status": "ok", "message": "Service is healthy"}
 
 
+@app.get("/health/pdf-queue")
+def pdf_queue_stats():
+    return pdf_executor.stats()
+
+
+@app.get("/health/render-cache")
+def render_cache_stats():
+    return render_cache.stats()
+
+
+@app.get("/health/documents")
+def document_pool_stats():
+    return {
+        "pdfplumber": documents.plumber_pool.stats(),
+        "pdfium": documents.pdfium_pool.stats(),
+    }
+
+
+@app.get("/health/translation-cache")
+def translation_cache_stats():
+    return translation_cache.stats()
+
+
+@app.get("/health/llm")
+def llm_scheduler_stats():
+    return llm.scheduler.stats()
+
+
+@app.get("/health/translate-question")
+def translate_question_stats():
+    return translation_flights.stats()
+
+
+@app.get("/health/json-cache")
+def json_cache_stats():
+    return gzip_cache_stats()
+
+
+@app.get("/health/markdown-cache")
+def markdown_cache_stats():
+    return fragment_cache.stats()
+
+
+# Contadores que ya llevan las cachés y colas, leídos en cada scrape de /metrics
+metrics.CACHE_REQUESTS.add_callback(
+    metrics.stats_samples(
+        render_cache.stats,
+        {
+            "memory_hits": {"cache": "render", "result": "hit"},
+            "disk_hits": {"cache": "render", "result": "disk_hit"},
+            "misses": {"cache": "render", "result": "miss"},
+        },
+    )
+)
+metrics.CACHE_REQUESTS.add_callback(
+    metrics.stats_samples(
+        translation_cache.stats,
+        {
+            "memory_hits": {"cache": "translation", "result": "hit"},
+            "db_hits": {"cache": "translation", "result": "disk_hit"},
+            "misses": {"cache": "translation", "result": "miss"},
+        },
+    )
+)
+for cache_name, cache in (("markdown_fragment", fragment_cache), ("json_gzip", gzip_cache)):
+    metrics.CACHE_REQUESTS.add_callback(
+        metrics.stats_samples(
+            cache.stats,
+            {
+                "hits": {"cache": cache_name, "result": "hit"},
+                "misses": {"cache": cache_name, "result": "miss"},
+            },
+        )
+    )
+for pool in (documents.plumber_pool, documents.pdfium_pool):
+    metrics.CACHE_REQUESTS.add_callback(
+        metrics.stats_samples(
+            pool.stats,
+            {
+                "hits": {"cache": f"{pool.name}_documents", "result": "hit"},
+                "opens": {"cache": f"{pool.name}_documents", "result": "miss"},
+            },
+        )
+    )
+metrics.CACHE_REQUESTS.add_callback(
+    metrics.stats_samples(
+        translation_flights.stats,
+        {
+            "coalesced": {"cache": "translate_question_inflight", "result": "hit"},
+            "leaders": {"cache": "translate_question_inflight", "result": "miss"},
+        },
+    )
+)
+metrics.QUEUE_DEPTH.add_callback(
+    metrics.stats_samples(
+        pdf_executor.stats,
+        {
+            "queued": {"queue": "pdf", "state": "queued"},
+            "running": {"queue": "pdf", "state": "running"},
+        },
+    )
+)
+metrics.QUEUE_DEPTH.add_callback(
+    metrics.stats_samples(
+        llm.scheduler.stats,
+        {
+            "queued": {"queue": "llm", "state": "queued"},
+            "running": {"queue": "llm", "state": "running"},
+        },
+    )
+)
+
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/exams")
 def get_exams():
     return [
@@ -638,100 +906,146 @@ def get_exams():
     ]
 
 
+def encode_cursor(question_number: int) -> str:
+    return base64.urlsafe_b64encode(f"after:{question_number}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, number = base64.urlsafe_b64decode(padded).decode().partition(":")
+        if prefix != "after":
+            raise ValueError(cursor)
+        return int(number)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(value: Optional[str]) -> List[str]:
+    names = [name.strip() for name in value.split(",") if name.strip()] if value else []
+    unknown = [name for name in names if name not in QUESTION_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    return names
+
+
+def build_questions_page(
+    catalog,
+    limit: int,
+    randomize: bool,
+    offset: int,
+    cursor: Optional[str],
+    indices,
+    projected: List[str],
+) -> tuple:
+    total = len(indices)
+    next_cursor = None
+
+    if randomize:
+        questions = catalog.select(limit, True, indices)
+    else:
+        start = 0
+        if cursor:
+            after = decode_cursor(cursor)
+            start = next(
+                (pos for pos, i in enumerate(indices) if catalog.numbers[i] > after),
+                total,
+            )
+        start += offset
+        questions = catalog.select(limit, False, indices[start:])
+        if questions and start + len(questions) < total:
+            next_cursor = encode_cursor(
+                catalog.numbers[indices[start + len(questions) - 1]]
+            )
+
+    # Proyección de campos (p. ej. exclude=explicacion)
+    if len(projected) != len(QUESTION_FIELDS):
+        questions = [{name: q.get(name) for name in projected} for q in questions]
+
+    body = dumps(questions)
+    # ETag fuerte: hash del cuerpo exacto de la respuesta
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return body, etag, total, next_cursor
+
+
 @app.get("/questions/{exam_id}")
 def get_questions(
     exam_id: str,
     lang: str = Query("es", regex="^(es|en)$"),
     limit: int = 10,
     randomize: bool = False,
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    from_question: Optional[int] = None,
+    to_question: Optional[int] = None,
+    has_discussion: Optional[bool] = None,
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
 ):
-    # Try to load from individual JSON files first
-    json_dir = DATA_DIR / exam_id / "questions_json" / lang
-    
-    if json_dir.exists():
-        questions_data = []
-        json_files = sorted(json_dir.glob("*.json"), key=lambda x: int(x.stem.split('_')[0]) if x.stem.split('_')[0].isdigit() else 0)
-        
-        for json_file in json_files:
-            try:
-                with open(json_file, "r", encoding="utf-8") as f:
-                    q_data = json.load(f)
-                    # Normalize to Spanish keys structure
-                    normalized_q = {
-                        "numero": str(q_data.get("id_question", "")),
-                        "pregunta": q_data.get("short_question", ""),
-                        "opciones": [
-                            {
-                                "letra": opt.get("letter", ""),
-                                "texto": opt.get("text", ""),
-                                "es_correcta": opt.get("is_correct", False),
-                            }
-                            for opt in q_data.get("options", [])
-                        ],
-                        "respuesta_correcta": q_data.get("correct_answer", ""),
-                        "explicacion": q_data.get("explanation", ""),
-                    }
-                    questions_data.append(normalized_q)
-            except Exception as e:
-                print(f"Error reading {json_file}: {e}")
-                continue
-        
-        if questions_data:
-            if randomize:
-                random.shuffle(questions_data)
-            if limit > 0:
-                questions_data = questions_data[:limit]
-            return questions_data
-    
-    # Fallback to old format
-    filename = (
-        f"{exam_id}_questions_{lang}.json"
-        if lang == "es"
-        else f"{exam_id}_questions.json"
-    )
-    file_path = DATA_DIR / filename
+    # Catálogo en memoria: almacén de preguntas o, si no hay, el JSON antiguo
+    try:
+        catalog = get_catalog(exam_id, lang)
+    except InvalidExamId as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    if not file_path.exists():
+    if catalog is None:
+        filename = legacy_questions_path(exam_id, lang).name
         raise HTTPException(
             status_code=404, detail=f"Questions file not found: {filename}"
         )
 
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        # Normalize data structure if English
-        if lang == "en":
-            normalized_data = []
-            for q in data:
-                normalized_data.append(
-                    {
-                        "numero": q.get("number"),
-                        "pregunta": q.get("question"),
-                        "opciones": [
-                            {
-                                "letra": opt.get("letter"),
-                                "texto": opt.get("text"),
-                                "es_correcta": opt.get("is_correct"),
-                            }
-                            for opt in q.get("options", [])
-                        ],
-                        "respuesta_correcta": q.get("correct_answer"),
-                        "explicacion": q.get("explanation", ""),
-                    }
-                )
-            data = normalized_data
+    selected_fields = parse_fields(fields) or list(QUESTION_FIELDS)
+    excluded_fields = set(parse_fields(exclude))
+    projected = [name for name in selected_fields if name not in excluded_fields]
 
-        if randomize:
-            random.shuffle(data)
+    def build():
+        indices = catalog.filter(from_question, to_question, has_discussion)
+        return build_questions_page(
+            catalog, limit, randomize, offset, cursor, indices, projected
+        )
 
-        if limit > 0:
-            data = data[:limit]
+    if randomize:
+        body, _, total, next_cursor = build()
+        headers = {"X-Total-Count": str(total), "Cache-Control": "no-store"}
+        return json_response(body, accept_encoding, headers)
 
-        return data
+    # Páginas sin aleatoriedad: bytes ya serializados mientras el catálogo no cambie
+    key = (limit, offset, cursor, from_question, to_question, has_discussion, tuple(projected))
+    body, etag, total, next_cursor = catalog.cached_page(key, build)
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    headers = {"X-Total-Count": str(total), "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return json_response(body, accept_encoding, headers, etag, if_none_match)
+
+
+@app.get("/search/{exam_id}")
+def search_questions(
+    exam_id: str,
+    q: str = Query(..., min_length=1),
+    lang: Optional[str] = Query(None, regex="^(es|en)$"),
+    limit: int = Query(20, ge=1, le=100),
+):
+    try:
+        store = get_question_store(exam_id, create=False)
+    except InvalidExamId as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if store is None:
+        raise HTTPException(status_code=404, detail=f"Exam not found: {exam_id}")
+
+    start = time.perf_counter()
+    results = store.search(q, lang, limit)
+    return {
+        "query": q,
+        "results": results,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
 
 
 @app.get("/analyze-pages")
@@ -739,6 +1053,7 @@ async def analyze_pages(
     start_question: int = Query(...),
     end_question: int = Query(...),
     pdf_filename: str = Query("az-204.pdf"),
+    accept_encoding: Optional[str] = Header(None),
 ):
     pdf_path = DATA_DIR / pdf_filename
     if not pdf_path.exists():
@@ -747,186 +1062,145 @@ async def analyze_pages(
     results = []
 
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            total_pages = len(pdf.pages)
-            page_texts = {}
-
-            def get_text(page_idx):
-                if page_idx not in page_texts:
-                    if 0 <= page_idx < total_pages:
-                        page_texts[page_idx] = pdf.pages[page_idx].extract_text() or ""
-                    else:
-                        page_texts[page_idx] = ""
-                return page_texts[page_idx]
-
-            # Las primeras 17 páginas son el menú, comenzamos desde la 18 (índice 17)
-            scan_idx = 17
-
-            for q_num in range(start_question, end_question + 1):
-                q_pattern = f"Question #{q_num}"
-                next_pattern = f"Question #{q_num + 1}"
-
-                q_start = -1
-                q_end = -1
-
-                # Search for start
-                found_start = False
-                for i in range(scan_idx, total_pages):
-                    text = get_text(i)
-                    if q_pattern in text:
-                        q_start = i
-                        scan_idx = i
-                        found_start = True
-                        break
-
-                if not found_start:
-                    # Try searching from beginning if not found (in case of disorder or restart)
-                    # But for now, assume sequential.
-                    results.append(
-                        {
-                            "question": q_num,
-                            "start_page": None,
-                            "end_page": None,
-                            "status": "Not Found",
-                        }
-                    )
-                    continue
-
-                # Search for end (start of next question)
-                found_end = False
-                for i in range(q_start, total_pages):
-                    text = get_text(i)
-                    if next_pattern in text:
-                        q_end = i
-                        found_end = True
-                        break
-
-                if not found_end:
-                    # Heuristic: assume it ends 2 pages later or at end of doc
-                    q_end = min(q_start + 2, total_pages - 1)
+        locator = await run_pdf_task(get_question_locator, pdf_path)
 
+        for q_num in range(start_question, end_question + 1):
+            page_range = locator.lookup(q_num)
+            if page_range is None:
                 results.append(
                     {
                         "question": q_num,
-                        "start_page": q_start + 1,
-                        "end_page": q_end + 1,
-                        "status": "Found",
+                        "start_page": None,
+                        "end_page": None,
+                        "status": "Not Found",
                     }
                 )
+                continue
 
-                if found_end:
-                    scan_idx = q_end
-                else:
-                    scan_idx = q_start
+            results.append(
+                {
+                    "question": q_num,
+                    "start_page": page_range[0] + 1,
+                    "end_page": page_range[1] + 1,
+                    "status": "Found",
+                }
+            )
 
-            return results
+        return json_response(dumps(results), accept_encoding)
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error analyzing pages: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/question-pages/{question_number}")
+async def get_question_pages(
+    question_number: int,
+    pdf_filename: str = Query("az-204.pdf"),
+):
+    pdf_path = DATA_DIR / pdf_filename
+    if not pdf_path.exists():
+        raise HTTPException(status_code=404, detail="PDF not found")
+
+    locator = await run_pdf_task(get_question_locator, pdf_path)
+    page_range = locator.lookup(question_number)
+    if page_range is None:
+        raise HTTPException(
+            status_code=404, detail=f"Question #{question_number} not found in PDF"
+        )
+
+    return {
+        "question": question_number,
+        "start_page": page_range[0] + 1,
+        "end_page": page_range[1] + 1,
+        "source": locator.source(question_number),
+    }
+
+
 @app.get("/questions-md/{exam_id}/README.md")
-async def get_unified_markdown(
+def get_unified_markdown(
     exam_id: str,
     full: bool = Query(False),
     lang: str = Query("es", regex="^(es|en)$"),
 ):
-    md_dir = DATA_DIR / exam_id / "questions_md" / lang
+    try:
+        store = get_question_store(exam_id, create=False)
+    except InvalidExamId as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if not md_dir.exists():
+    # Solo (número, fecha de actualización); el markdown se lee por pregunta
+    versions = store.markdown_versions(lang) if store is not None else []
+    if not versions:
         raise HTTPException(
             status_code=404,
-            detail=f"Markdown directory not found for exam {exam_id} and language {lang}",
+            detail=f"Markdown not found for exam {exam_id} and language {lang}",
         )
 
-    files = []
-    for f in md_dir.iterdir():
-        if f.suffix != ".md":
-            continue
+    return StreamingResponse(
+        iter_readme_html(store, lang, full, versions),
+        media_type="text/html; charset=utf-8",
+    )
+
 
-        is_full_file = f.stem.endswith("_full")
+# Mount frontend
+frontend_path = Path(__file__).parent.parent / "frontend" / "www"
 
-        if full and is_full_file:
-            files.append(f)
-        elif not full and not is_full_file:
-            files.append(f)
 
-    # Sort files numerically
-    def get_question_number(file_path):
-        name = file_path.stem
-        if "_full" in name:
-            name = name.replace("_full", "")
-        try:
-            return int(name)
-        except ValueError:
-            return float("inf")  # Put non-numeric at the end
-
-    files.sort(key=get_question_number)
-
-    unified_content = ""
-    for f in files:
-        with open(f, "r", encoding="utf-8") as file:
-            unified_content += file.read() + "\n\n---\n\n"
-
-    html_content = markdown.markdown(unified_content, extensions=['fenced_code', 'tables'])
-    
-    full_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1">
-        <title>Exam Questions</title>
-        <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/github-markdown-css/5.2.0/github-markdown.min.css">
-        <style>
-            .markdown-body {{
-                box-sizing: border-box;
-                min-width: 200px;
-                max-width: 980px;
-                margin: 0 auto;
-                padding: 45px;
-            }}
-            @media (max-width: 767px) {{
-                .markdown-body {{
-                    padding: 15px;
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-        <article class="markdown-body">
-            {html_content}
-        </article>
-    </body>
-    </html>
-    """
-
-    return HTMLResponse(content=full_html)
+static_manifest = StaticManifest(frontend_path)
 
 
-# Mount frontend
-frontend_path = Path(__file__).parent.parent / "frontend" / "www"
+@app.get("/health/static")
+def static_manifest_stats():
+    return static_manifest.stats()
+
+
+@app.post("/health/static/reload")
+def reload_static_manifest():
+    # Tras un ng build: vuelve a leer frontend/www sin reiniciar el servidor
+    static_manifest.load()
+    return static_manifest.stats()
 
 
 @app.get("/{full_path:path}")
-async def serve_frontend(full_path: str):
-    if not frontend_path.exists():
+def serve_frontend(
+    full_path: str,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    if not static_manifest.assets:
         raise HTTPException(
             status_code=404,
             detail="Frontend not found. Please build the Ionic app first.",
         )
 
-    file_path = frontend_path / full_path
-    if file_path.exists() and file_path.is_file():
-        return FileResponse(file_path)
-
-    # Fallback to index.html for SPA routing (e.g. /home)
-    index_path = frontend_path / "index.html"
-    if index_path.exists():
-        return FileResponse(index_path)
-
-    raise HTTPException(status_code=404, detail="index.html not found")
+    # Archivo del build o fallback a index.html para rutas del SPA (e.g. /home)
+    asset = static_manifest.resolve(full_path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="index.html not found")
+
+    encoding = choose_encoding(asset, accept_encoding)
+    headers = {
+        "ETag": asset.variant_etag(encoding),
+        "Cache-Control": asset.cache_control,
+    }
+    if asset.encoded:
+        headers["Vary"] = "Accept-Encoding"
+
+    if asset_etag_matches(if_none_match, asset):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        return Response(
+            content=asset.get_encoded(encoding), media_type=asset.media_type, headers=headers
+        )
+    if asset.data is not None:
+        return Response(content=asset.data, media_type=asset.media_type, headers=headers)
+    return FileResponse(
+        asset.path, media_type=asset.media_type, headers=headers, stat_result=asset.stat
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,82 @@
+import os
+import threading
+from typing import Iterator
+
+import markdown
+
+from app.lru import LRUCache
+from app.question_store import QuestionStore
+
+# README unificado del examen: cada pregunta se convierte a HTML por separado y
+# el fragmento se guarda en memoria con la fecha de actualización de su fila en
+# el almacén, así que solo se vuelven a renderizar las preguntas que cambiaron.
+MARKDOWN_CACHE_ITEMS = int(os.getenv("MARKDOWN_CACHE_ITEMS", "4096"))
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables"]
+
+README_HEAD = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1">
+        <title>Exam Questions</title>
+        <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/github-markdown-css/5.2.0/github-markdown.min.css">
+        <style>
+            .markdown-body {
+                box-sizing: border-box;
+                min-width: 200px;
+                max-width: 980px;
+                margin: 0 auto;
+                padding: 45px;
+            }
+            @media (max-width: 767px) {
+                .markdown-body {
+                    padding: 15px;
+                }
+            }
+        </style>
+    </head>
+    <body>
+        <article class="markdown-body">
+"""
+
+README_TAIL = """
+        </article>
+    </body>
+    </html>
+    """
+
+QUESTION_SEPARATOR = "\n<hr />\n"
+
+# Markdown() no es thread-safe; se reutiliza una instancia por hilo
+_local = threading.local()
+
+
+def render_markdown(text: str) -> str:
+    md = getattr(_local, "md", None)
+    if md is None:
+        md = _local.md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return md.reset().convert(text)
+
+
+fragment_cache: LRUCache[str] = LRUCache(max_items=MARKDOWN_CACHE_ITEMS)
+
+
+def question_fragment(store: QuestionStore, lang: str, full: bool, number: int, updated_at: float) -> str:
+    # La fecha de actualización forma parte de la clave: una fila modificada
+    # falla en la caché y su fragmento anterior sale por LRU
+    key = (store.exam_id, lang, full, number, updated_at)
+    html = fragment_cache.get(key)
+    if html is None:
+        html = render_markdown(store.get_markdown(lang, number, full) or "")
+        fragment_cache.put(key, html)
+    return html
+
+
+def iter_readme_html(store: QuestionStore, lang: str, full: bool, versions: list) -> Iterator[bytes]:
+    # Se envía la cabecera de inmediato y luego un fragmento por pregunta
+    yield README_HEAD.encode("utf-8")
+    for number, updated_at in versions:
+        html = question_fragment(store, lang, full, number, updated_at)
+        yield (html + QUESTION_SEPARATOR).encode("utf-8")
+    yield README_TAIL.encode("utf-8")
@@ -0,0 +1,244 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Métricas en formato de exposición de Prometheus (texto 0.0.4), sin dependencias.
+# Los contadores e histogramas se actualizan en las rutas calientes; los datos que
+# ya llevan las cachés y colas en sus stats() se leen con callbacks en cada scrape.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "itqs_"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+PAGE_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+Samples = Iterable[Tuple[dict, float]]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], Samples]] = []
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def add_callback(self, fn: Callable[[], Samples]):
+        # fn() -> [(labels, valor)], evaluado en cada scrape
+        self._callbacks.append(fn)
+
+    def _own_lines(self) -> List[str]:
+        return []
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._own_lines())
+        for fn in self._callbacks:
+            try:
+                for labels, value in fn():
+                    if value is not None:
+                        lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+            except Exception as e:
+                print(f"Error collecting metric {self.name}: {e}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _own_lines(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # por serie: [conteo por bucket (+Inf al final), suma, total]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _own_lines(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in series:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(
+    Histogram(
+        "stage_duration_seconds",
+        "Time spent in each stage of question extraction (pdf_open, page_search, layout, "
+        "render, encode, base64, llm_queue, llm, file_write)",
+        ["stage"],
+    )
+)
+TRANSLATE_QUESTION_SECONDS = registry.register(
+    Histogram(
+        "translate_question_duration_seconds",
+        "End-to-end /translate-question latency by outcome (saved, extracted, error)",
+        ["outcome"],
+    )
+)
+LLM_TOKENS = registry.register(
+    Counter("llm_tokens_total", "Tokens reported by Azure OpenAI in response.usage", ["kind"])
+)
+LLM_REQUESTS = registry.register(
+    Counter("llm_requests_total", "Azure OpenAI calls by result (ok, throttled, error, cancelled)", ["result"])
+)
+PAGES_SCANNED = registry.register(
+    Histogram(
+        "question_lookup_pages_scanned",
+        "PDF pages whose text was scanned to answer a question lookup (0 when served from the locator)",
+        buckets=PAGE_BUCKETS,
+    )
+)
+QUESTION_LOOKUPS = registry.register(
+    Counter("question_lookups_total", "Question page-range lookups by source (saved, scan, miss)", ["source"])
+)
+CACHE_REQUESTS = registry.register(
+    Counter("cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+)
+IMAGE_BUDGET = registry.register(
+    Counter(
+        "vision_image_budget_total",
+        "Page images for vision prompts: pages, images, bytes and estimated tokens sent "
+        "vs. tokens of the same pages at full size",
+        ["kind"],
+    )
+)
+QUEUE_DEPTH = registry.register(
+    Gauge("queue_depth", "Work waiting or running in the internal queues", ["queue", "state"])
+)
+
+
+def stage(name: str):
+    return STAGE_SECONDS.time(stage=name)
+
+
+def cache_result(cache: str, hit: bool, count: int = 1):
+    if count:
+        CACHE_REQUESTS.inc(count, cache=cache, result="hit" if hit else "miss")
+
+
+def record_usage(usage) -> None:
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, kind="completion")
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+    if cached:
+        LLM_TOKENS.inc(cached, kind="cached_prompt")
+
+
+def stats_samples(stats: Callable[[], dict], mapping: Dict[str, dict]) -> Callable[[], Samples]:
+    # Convierte campos de un stats() existente en muestras: {campo: labels}
+    def collect() -> Samples:
+        values: Optional[dict] = stats()
+        return [(labels, values.get(field)) for field, labels in mapping.items()]
+
+    return collect
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pdfplumber
+
+from app import metrics
+from app.documents import plumber_pool
+
+# Índice persistente del texto de cada página de un PDF.
+# Se guarda junto al PDF en DATA_DIR/{exam_id}/page_text.json y se invalida
+# cuando cambia el mtime o el tamaño del archivo.
+INDEX_VERSION = 1
+INDEX_FILENAME = "page_text.json"
+
+# Construcción en paralelo: cada proceso abre su propio documento y extrae un
+# bloque de páginas. Por debajo de PARALLEL_MIN_PAGES no compensa lanzar procesos.
+BUILD_WORKERS = int(os.getenv("PDF_INDEX_WORKERS", "0")) or os.cpu_count() or 1
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_INDEX_PARALLEL_MIN_PAGES", "32"))
+CHUNKS_PER_WORKER = 4
+# Páginas extraídas de una en una que se acumulan antes de reescribir el JSON
+SAVE_EVERY_PAGES = int(os.getenv("PDF_INDEX_SAVE_EVERY", "16"))
+
+
+def file_fingerprint(path: Path) -> dict:
+    stat = path.stat()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+_sha256_cache: Dict[Path, tuple] = {}
+_sha256_lock = threading.Lock()
+
+
+def file_sha256(path: Path) -> str:
+    # Hash de contenido memorizado por (mtime, tamaño) para no releer el PDF
+    path = Path(path).resolve()
+    fingerprint = file_fingerprint(path)
+    with _sha256_lock:
+        cached = _sha256_cache.get(path)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    with _sha256_lock:
+        _sha256_cache[path] = (fingerprint, digest)
+    return digest
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with metrics.stage("file_write"):
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+def write_json_atomic(path: Path, data) -> None:
+    write_atomic(path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+def _extract_pages(pdf_path: str, page_indices: List[int]) -> Dict[int, str]:
+    with pdfplumber.open(pdf_path) as pdf:
+        return {i: pdf.pages[i].extract_text() or "" for i in page_indices}
+
+
+def _split_chunks(page_indices: List[int], n_chunks: int) -> List[List[int]]:
+    size = max(1, -(-len(page_indices) // n_chunks))
+    return [page_indices[i : i + size] for i in range(0, len(page_indices), size)]
+
+
+def extract_pages_parallel(
+    pdf_path: Path, page_indices: List[int], workers: int = BUILD_WORKERS
+) -> Dict[int, str]:
+    # Bloques contiguos (mejor localidad en el PDF) y más bloques que procesos
+    # para repartir la carga cuando hay páginas más pesadas que otras.
+    chunks = _split_chunks(page_indices, workers * CHUNKS_PER_WORKER)
+    texts: Dict[int, str] = {}
+    # 'spawn' evita heredar hilos y locks del servidor al hacer fork
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        for result in executor.map(_extract_pages, [str(pdf_path)] * len(chunks), chunks):
+            texts.update(result)
+    return texts
+
+
+class PageTextIndex:
+    def __init__(self, pdf_path: Path, index_path: Path):
+        self.pdf_path = pdf_path
+        self.index_path = index_path
+        self.fingerprint = file_fingerprint(pdf_path)
+        self.total_pages = 0
+        self.pages: Dict[int, str] = {}
+        # _lock solo protege self.pages; la extracción y la escritura del JSON
+        # corren fuera de él para no bloquear las lecturas de otras páginas
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        self._load()
+
+    def _load(self):
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if (
+                    data.get("version") == INDEX_VERSION
+                    and data.get("fingerprint") == self.fingerprint
+                ):
+                    self.total_pages = data["total_pages"]
+                    self.pages = {int(k): v for k, v in data["pages"].items()}
+                    return
+            except Exception as e:
+                print(f"Error reading page index {self.index_path}: {e}")
+
+        # Índice inexistente u obsoleto: solo necesitamos el número de páginas
+        with plumber_pool.acquire(self.pdf_path) as pdf:
+            self.total_pages = len(pdf.pages)
+        self.pages = {}
+        self._unsaved = 1
+
+    @property
+    def is_complete(self) -> bool:
+        return len(self.pages) >= self.total_pages
+
+    def _extract(self, page_idx: int) -> str:
+        with plumber_pool.acquire(self.pdf_path) as pdf:
+            page = pdf.pages[page_idx]
+            text = page.extract_text() or ""
+            # El documento sigue abierto en el pool: liberamos la caché de la página
+            page.close()
+        return text
+
+    def _remember(self, texts: Dict[int, str]) -> int:
+        with self._lock:
+            for i, text in texts.items():
+                if i not in self.pages:
+                    self.pages[i] = text
+                    self._unsaved += 1
+            return self._unsaved
+
+    def get_text(self, page_idx: int) -> str:
+        if not 0 <= page_idx < self.total_pages:
+            return ""
+        text = self.pages.get(page_idx)
+        metrics.cache_result("page_text", text is not None)
+        if text is not None:
+            return text
+
+        text = self._extract(page_idx)
+        # Las páginas sueltas se persisten por lotes (y al apagar el servidor)
+        if self._remember({page_idx: text}) >= SAVE_EVERY_PAGES:
+            self.save()
+        return text
+
+    def build(self, workers: Optional[int] = None):
+        workers = workers or BUILD_WORKERS
+        # Un solo build a la vez por índice; get_text sigue respondiendo mientras
+        with self._build_lock:
+            with self._lock:
+                missing = [i for i in range(self.total_pages) if i not in self.pages]
+            metrics.cache_result("page_text", True, self.total_pages - len(missing))
+            metrics.cache_result("page_text", False, len(missing))
+            if workers > 1 and len(missing) >= PARALLEL_MIN_PAGES:
+                texts = extract_pages_parallel(self.pdf_path, missing, min(workers, len(missing)))
+            else:
+                texts = {i: self._extract(i) for i in missing}
+            self._remember(texts)
+            self.save()
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                if not self._unsaved:
+                    return
+                pages = {str(k): v for k, v in sorted(self.pages.items())}
+                self._unsaved = 0
+            write_json_atomic(
+                self.index_path,
+                {
+                    "version": INDEX_VERSION,
+                    "pdf": self.pdf_path.name,
+                    "fingerprint": self.fingerprint,
+                    "total_pages": self.total_pages,
+                    "pages": pages,
+                },
+            )
+
+
+_indexes: Dict[Path, PageTextIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def index_path_for(pdf_path: Path) -> Path:
+    return pdf_path.parent / pdf_path.stem / INDEX_FILENAME
+
+
+def get_page_index(pdf_path: Path) -> PageTextIndex:
+    pdf_path = Path(pdf_path).resolve()
+    with _indexes_lock:
+        index: Optional[PageTextIndex] = _indexes.get(pdf_path)
+        if index is None or index.fingerprint != file_fingerprint(pdf_path):
+            index = PageTextIndex(pdf_path, index_path_for(pdf_path))
+            _indexes[pdf_path] = index
+        return index
+
+
+def save_page_indexes():
+    # Al apagar el servidor: persiste las páginas sueltas aún no guardadas
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        try:
+            index.save()
+        except Exception as e:
+            print(f"Error saving page index {index.index_path}: {e}")
+
+
+if __name__ == "__main__":
+    # Modo de construcción: python -m app.pdf_index [archivo.pdf ...] [--workers N]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the page-text index of exam PDFs")
+    parser.add_argument("pdfs", nargs="*", type=Path)
+    parser.add_argument("--workers", type=int, default=BUILD_WORKERS)
+    parser.add_argument("--force", action="store_true", help="Rebuild from scratch")
+    args = parser.parse_args()
+
+    pdf_paths = args.pdfs or sorted((Path(__file__).parent / "data").glob("*.pdf"))
+    for pdf_path in pdf_paths:
+        if args.force:
+            index_path_for(pdf_path.resolve()).unlink(missing_ok=True)
+        index = get_page_index(pdf_path)
+        started = time.perf_counter()
+        index.build(workers=args.workers)
+        print(
+            f"{pdf_path.name}: {index.total_pages} pages indexed in "
+            f"{time.perf_counter() - started:.1f}s ({args.workers} workers)"
+        )
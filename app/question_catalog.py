@@ -0,0 +1,190 @@
+import json
+import random
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app import metrics
+from app.lru import LRUCache
+from app.question_store import DATA_DIR, get_question_store
+
+# Catálogo en memoria por (examen, idioma), ya normalizado a la forma `Question`.
+# Se recarga solo cuando cambia su origen: una escritura en el almacén de
+# preguntas (también desde otro proceso) o el mtime del JSON antiguo
+# {exam_id}_questions_{lang}.json.
+
+
+def normalize_question(q_data: dict) -> dict:
+    # Normalize to Spanish keys structure
+    return {
+        "numero": str(q_data.get("id_question", "")),
+        "pregunta": q_data.get("short_question", ""),
+        "opciones": [
+            {
+                "letra": opt.get("letter", ""),
+                "texto": opt.get("text", ""),
+                "es_correcta": opt.get("is_correct", False),
+            }
+            for opt in q_data.get("options", [])
+        ],
+        "respuesta_correcta": q_data.get("correct_answer", ""),
+        "explicacion": q_data.get("explanation", ""),
+    }
+
+
+def normalize_legacy_question(q: dict) -> dict:
+    return {
+        "numero": q.get("number"),
+        "pregunta": q.get("question"),
+        "opciones": [
+            {
+                "letra": opt.get("letter"),
+                "texto": opt.get("text"),
+                "es_correcta": opt.get("is_correct"),
+            }
+            for opt in q.get("options", [])
+        ],
+        "respuesta_correcta": q.get("correct_answer"),
+        "explicacion": q.get("explanation", ""),
+    }
+
+
+def legacy_questions_path(exam_id: str, lang: str) -> Path:
+    filename = (
+        f"{exam_id}_questions_{lang}.json"
+        if lang == "es"
+        else f"{exam_id}_questions.json"
+    )
+    return DATA_DIR / filename
+
+
+# Respuestas ya serializadas por catálogo; se descartan junto con él al cambiar
+QUESTION_PAGE_CACHE_ITEMS = 64
+
+QUESTION_FIELDS = ("numero", "pregunta", "opciones", "respuesta_correcta", "explicacion")
+
+
+def _question_number(numero) -> int:
+    try:
+        return int(numero)
+    except (TypeError, ValueError):
+        return 0
+
+
+class QuestionCatalog:
+    def __init__(
+        self,
+        exam_id: str,
+        lang: str,
+        questions: List[dict],
+        version: tuple,
+        has_discussion: Optional[List[bool]] = None,
+    ):
+        self.exam_id = exam_id
+        self.lang = lang
+        self.questions = questions
+        self.version = version
+        # Metadatos paralelos a `questions` para filtrar sin recorrer los dicts
+        self.numbers = [_question_number(q.get("numero")) for q in questions]
+        self.has_discussion = has_discussion or [False] * len(questions)
+        self._pages: LRUCache[tuple] = LRUCache(max_items=QUESTION_PAGE_CACHE_ITEMS)
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def filter(
+        self,
+        from_question: Optional[int] = None,
+        to_question: Optional[int] = None,
+        has_discussion: Optional[bool] = None,
+    ) -> Sequence[int]:
+        indices = range(len(self.questions))
+        if from_question is None and to_question is None and has_discussion is None:
+            return indices
+        return [
+            i
+            for i in indices
+            if (from_question is None or self.numbers[i] >= from_question)
+            and (to_question is None or self.numbers[i] <= to_question)
+            and (has_discussion is None or self.has_discussion[i] == has_discussion)
+        ]
+
+    def select(
+        self, limit: int, randomize: bool, indices: Optional[Sequence[int]] = None
+    ) -> List[dict]:
+        if indices is None:
+            indices = range(len(self.questions))
+        count = len(indices)
+        if limit <= 0 or limit > count:
+            limit = count
+        if randomize:
+            # Muestreo de índices: no se copia ni se baraja la lista completa
+            return [self.questions[i] for i in random.sample(indices, limit)]
+        return [self.questions[i] for i in indices[:limit]]
+
+    def cached_page(self, key: tuple, build: Callable[[], tuple]) -> tuple:
+        page = self._pages.get(key)
+        metrics.cache_result("question_page", page is not None)
+        if page is None:
+            page = build()
+            self._pages.put(key, page)
+        return page
+
+
+_catalogs: Dict[Tuple[str, str], QuestionCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def _load_from_store(exam_id: str, lang: str) -> Optional[QuestionCatalog]:
+    store = get_question_store(exam_id, create=False)
+    if store is None:
+        return None
+
+    version = ("store",) + store.data_version()
+    cached = _catalogs.get((exam_id, lang))
+    if cached is not None and cached.version == version:
+        return cached
+
+    rows = store.list(lang)
+    if not rows:
+        return None
+    return QuestionCatalog(
+        exam_id,
+        lang,
+        [normalize_question(row["data"]) for row in rows],
+        version,
+        [bool(row["data"].get("community_discussion")) for row in rows],
+    )
+
+
+def _load_legacy(exam_id: str, lang: str) -> Optional[QuestionCatalog]:
+    file_path = legacy_questions_path(exam_id, lang)
+    try:
+        stat = file_path.stat()
+    except FileNotFoundError:
+        return None
+
+    version = ("legacy", stat.st_mtime_ns, stat.st_size)
+    cached = _catalogs.get((exam_id, lang))
+    if cached is not None and cached.version == version:
+        return cached
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    has_discussion = [bool(q.get("community_discussion")) for q in data]
+
+    # Normalize data structure if English
+    if lang == "en":
+        data = [normalize_legacy_question(q) for q in data]
+    return QuestionCatalog(exam_id, lang, data, version, has_discussion)
+
+
+def get_catalog(exam_id: str, lang: str) -> Optional[QuestionCatalog]:
+    with _catalogs_lock:
+        catalog = _load_from_store(exam_id, lang) or _load_legacy(exam_id, lang)
+        if catalog is not None:
+            _catalogs[(exam_id, lang)] = catalog
+        else:
+            _catalogs.pop((exam_id, lang), None)
+        return catalog
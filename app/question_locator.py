@@ -0,0 +1,149 @@
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from app import metrics
+from app.pdf_index import PageTextIndex, get_page_index
+from app.question_store import QuestionStore, get_question_store
+
+# Localizador "Question #N" -> (página inicial, página final), en base 0 e inclusivo.
+# Se construye con una sola pasada de regex sobre el índice de texto completo y se
+# complementa con los rangos ya guardados en el almacén de preguntas, que tienen prioridad.
+QUESTION_RE = re.compile(r"Question #(\d+)\b")
+
+# Las primeras 17 páginas son el índice del PDF y dan falsos positivos
+INDEX_PAGES_SKIP = 17
+
+# Límite para la última pregunta del documento (casos de estudio largos)
+MAX_QUESTION_PAGES = 10
+
+# Una línea presente en al menos esta fracción de páginas es encabezado o pie
+# de página (título del examen) y no cuenta como contenido de la pregunta anterior
+RUNNING_LINE_MIN_SHARE = 0.5
+
+
+def running_lines(texts: Iterable[str]) -> Set[str]:
+    counts: Counter = Counter()
+    total = 0
+    for text in texts:
+        total += 1
+        counts.update({line.strip() for line in text.splitlines() if line.strip()})
+    threshold = max(2, total * RUNNING_LINE_MIN_SHARE)
+    return {line for line, count in counts.items() if count >= threshold}
+
+
+def has_content_before(text: str, position: int, ignored: Set[str]) -> bool:
+    # ¿Hay contenido de la pregunta anterior antes del encabezado?
+    return any(
+        line.strip() and line.strip() not in ignored
+        for line in text[:position].splitlines()
+    )
+
+
+def page_ranges(
+    headers: Dict[int, Tuple[int, bool]], total_pages: int
+) -> Dict[int, Tuple[int, int]]:
+    # headers: pregunta -> (página del encabezado, hay contenido antes en esa página)
+    ordered = sorted(headers.items(), key=lambda item: (item[1][0], item[0]))
+    ranges = {}
+    for pos, (q_num, (start_idx, _)) in enumerate(ordered):
+        if pos + 1 < len(ordered):
+            next_idx, content_before = ordered[pos + 1][1]
+            end_idx = next_idx if content_before else next_idx - 1
+        else:
+            end_idx = min(start_idx + MAX_QUESTION_PAGES, total_pages - 1)
+        ranges[q_num] = (start_idx, max(start_idx, end_idx))
+    return ranges
+
+
+class QuestionLocator:
+    def __init__(self, index: PageTextIndex, store: QuestionStore):
+        self.index = index
+        self.store = store
+        self.scanned: Dict[int, Tuple[int, int]] = {}
+        self.saved: Dict[int, Tuple[int, int]] = {}
+        self._saved_revision = None
+        # Páginas recorridas por el último escaneo, aún no atribuidas a una búsqueda
+        self._unreported_pages = 0
+        self._lock = threading.Lock()
+        self._scan()
+        self._load_saved()
+
+    def _scan(self):
+        self.index.build()
+        total_pages = self.index.total_pages
+
+        texts = [self.index.pages.get(i, "") for i in range(INDEX_PAGES_SKIP, total_pages)]
+        ignored = running_lines(texts)
+
+        # Primera aparición de cada encabezado, en orden de página
+        headers: Dict[int, Tuple[int, bool]] = {}
+        for i, text in enumerate(texts, start=INDEX_PAGES_SKIP):
+            for match in QUESTION_RE.finditer(text):
+                q_num = int(match.group(1))
+                if q_num not in headers:
+                    headers[q_num] = (i, has_content_before(text, match.start(), ignored))
+
+        self.scanned = page_ranges(headers, total_pages)
+        self._unreported_pages = max(0, total_pages - INDEX_PAGES_SKIP)
+
+    def _load_saved(self):
+        if self.store.revision == self._saved_revision:
+            return
+        revision = self.store.revision
+        saved = {}
+        for q_num, (start_page, end_page) in self.store.page_ranges("es").items():
+            if 1 <= start_page <= end_page <= self.index.total_pages:
+                saved[q_num] = (start_page - 1, end_page - 1)
+        self.saved, self._saved_revision = saved, revision
+
+    def lookup(self, q_num: int) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            self._load_saved()
+            metrics.PAGES_SCANNED.observe(self._unreported_pages)
+            self._unreported_pages = 0
+            result = self.saved.get(q_num) or self.scanned.get(q_num)
+        metrics.QUESTION_LOOKUPS.inc(source=self.source(q_num) or "miss")
+        return result
+
+    def source(self, q_num: int) -> Optional[str]:
+        if q_num in self.saved:
+            return "saved"
+        if q_num in self.scanned:
+            return "scan"
+        return None
+
+
+_locators: Dict[Path, QuestionLocator] = {}
+_locators_lock = threading.Lock()
+# Un lock por PDF: el escaneo inicial (index.build()) corre fuera del lock
+# global para que un PDF frío no bloquee las búsquedas sobre los demás.
+_build_locks: Dict[Path, threading.Lock] = {}
+
+
+def _cached_locator(pdf_path: Path, index: PageTextIndex) -> Optional[QuestionLocator]:
+    locator = _locators.get(pdf_path)
+    if locator is not None and locator.index is index:
+        return locator
+    return None
+
+
+def get_question_locator(pdf_path: Path) -> QuestionLocator:
+    pdf_path = Path(pdf_path).resolve()
+    index = get_page_index(pdf_path)
+    with _locators_lock:
+        locator = _cached_locator(pdf_path, index)
+        if locator is not None:
+            return locator
+        build_lock = _build_locks.setdefault(pdf_path, threading.Lock())
+
+    with build_lock:
+        with _locators_lock:
+            locator = _cached_locator(pdf_path, index)
+        if locator is None:
+            locator = QuestionLocator(index, get_question_store(pdf_path.stem))
+            with _locators_lock:
+                _locators[pdf_path] = locator
+        return locator
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+from app.question_store import DATA_DIR, LANGS, STORE_FILENAME, get_question_store
+
+# Markdown de cada pregunta a partir de su JSON extraído. Cada fila del almacén
+# guarda el hash de sus entradas (JSON, páginas y MARKDOWN_RENDER_VERSION), así
+# que al cambiar el formato basta con subir la versión y regenerar offline:
+#     python -m app.question_markdown [exam_id ...] [--workers N] [--force]
+REBUILD_WORKERS = int(os.getenv("MARKDOWN_REBUILD_WORKERS", "0")) or os.cpu_count() or 1
+REBUILD_CHUNK_SIZE = 64
+
+# Versión del formato de json_to_markdown/json_to_markdown_full: subirla al
+# cambiar la salida de los renderizadores invalida los markdowns guardados
+MARKDOWN_RENDER_VERSION = 1
+
+
+def json_to_markdown(data: dict, pages: str, lang: str = "es") -> str:
+    title = "Pregunta" if lang == "es" else "Question"
+    pages_label = "Páginas" if lang == "es" else "Pages"
+    summary_label = "Resumen" if lang == "es" else "Summary"
+    answer_label = "Respuesta Correcta" if lang == "es" else "Correct Answer"
+
+    md = f"## {title} {data.get('id_question')} ({pages_label} {pages})\n\n"
+    md += f"**{summary_label}**\n\n{data.get('short_question')}\n\n"
+    md += f"**{answer_label}**\n\n{data.get('correct_answer')}"
+    return md
+
+
+def json_to_markdown_full(data: dict, pages: str, lang: str) -> str:
+    # Header
+    title = "Pregunta" if lang == "es" else "Question"
+    md = f"## {title} {data.get('id_question')} (Pages {pages})\n\n"
+
+    # Context / Full Question
+    context_title = "Contexto" if lang == "es" else "Context"
+    md += f"**{context_title}**\n\n{data.get('question_context')}\n\n"
+
+    # Image Explanation (if present)
+    img_exp = data.get("image_explanation")
+    if img_exp:
+        img_title = "Explicación de la Imagen" if lang == "es" else "Image Explanation"
+        md += f"**{img_title}**\n\n{img_exp}\n\n"
+
+    # Options
+    options_title = "Opciones" if lang == "es" else "Options"
+    md += f"**{options_title}**\n\n"
+    for opt in data.get("options", []):
+        check = "(Correcta)" if opt.get("is_correct") else ""
+        if lang == "en":
+            check = "(Correct)" if opt.get("is_correct") else ""
+        md += f"- **{opt.get('letter')}**: {opt.get('text')} {check}\n"
+    md += "\n"
+
+    # Correct Answer
+    ans_title = "Respuesta Correcta" if lang == "es" else "Correct Answer"
+    md += f"**{ans_title}**\n\n{data.get('correct_answer')}\n\n"
+
+    # Explanation
+    exp_title = "Explicación" if lang == "es" else "Explanation"
+    md += f"**{exp_title}**\n\n{data.get('explanation')}\n\n"
+
+    # Community Discussion
+    comm_disc = data.get("community_discussion")
+    if comm_disc:
+        comm_title = (
+            "Discusión de la Comunidad" if lang == "es" else "Community Discussion"
+        )
+        md += f"**{comm_title}**\n\n{comm_disc}\n\n"
+
+    return md
+
+
+def markdown_source(data: dict, pages: str, lang: str) -> str:
+    raw = json.dumps([MARKDOWN_RENDER_VERSION, lang, pages, data], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def render_question(data: dict, pages: str, lang: str) -> Tuple[str, str, str]:
+    return (
+        json_to_markdown(data, pages, lang),
+        json_to_markdown_full(data, pages, lang),
+        markdown_source(data, pages, lang),
+    )
+
+
+def row_pages(row: dict) -> str:
+    if row["start_page"] and row["end_page"]:
+        return f"{row['start_page']}-{row['end_page']}"
+    return str(row["data"].get("pages", "Unknown"))
+
+
+def _render_chunk(items: List[tuple]) -> List[tuple]:
+    # items: (lang, number, data, pages) -> (lang, number, md, md_full, source)
+    return [(lang, number) + render_question(data, pages, lang) for lang, number, data, pages in items]
+
+
+def rebuild_markdown(exam_id: str, workers: int = REBUILD_WORKERS, force: bool = False) -> dict:
+    store = get_question_store(exam_id, create=False)
+    if store is None:
+        raise ValueError(f"No question store for exam {exam_id}")
+
+    pending = []
+    total = 0
+    for lang in LANGS:
+        for row in store.list(lang):
+            total += 1
+            pages = row_pages(row)
+            if force or row["markdown_source"] != markdown_source(row["data"], pages, lang):
+                pending.append((lang, row["number"], row["data"], pages))
+
+    results: List[tuple] = []
+    chunks = [pending[i : i + REBUILD_CHUNK_SIZE] for i in range(0, len(pending), REBUILD_CHUNK_SIZE)]
+    if workers > 1 and len(chunks) > 1:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=ctx) as executor:
+            for chunk_result in executor.map(_render_chunk, chunks):
+                results.extend(chunk_result)
+    else:
+        for chunk in chunks:
+            results.extend(_render_chunk(chunk))
+
+    store.update_markdown(results)
+    return {"rows": total, "rebuilt": len(results)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild question markdown from the stored JSON")
+    parser.add_argument("exam_ids", nargs="*")
+    parser.add_argument("--workers", type=int, default=REBUILD_WORKERS)
+    parser.add_argument("--force", action="store_true", help="Rebuild every question")
+    args = parser.parse_args()
+
+    exam_ids = args.exam_ids or sorted(
+        d.name for d in DATA_DIR.iterdir() if (d / STORE_FILENAME).exists()
+    )
+    for exam_id in exam_ids:
+        started = time.perf_counter()
+        result = rebuild_markdown(exam_id, args.workers, args.force)
+        print(
+            f"{exam_id}: {result['rebuilt']}/{result['rows']} markdown rows rebuilt in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
@@ -0,0 +1,445 @@
+import html
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Almacén de preguntas traducidas: una base SQLite por examen en
+# DATA_DIR/{exam_id}/questions.sqlite3 con el JSON de cada idioma y sus dos
+# markdowns. Reemplaza a los seis archivos por pregunta de questions_json/{en,es}
+# y questions_md/{en,es}, que se importan automáticamente la primera vez.
+DATA_DIR = Path(__file__).parent / "data"
+STORE_FILENAME = "questions.sqlite3"
+LANGS = ("en", "es")
+
+# Índice de búsqueda: tabla FTS5 (índice invertido con ranking BM25) que se
+# mantiene en la misma transacción que cada escritura de `questions`.
+# El resumen de la pregunta pesa el doble que el resto del texto.
+SEARCH_WEIGHTS = (2.0, 1.0)
+SEARCH_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class InvalidExamId(ValueError):
+    pass
+
+
+class QuestionStore:
+    def __init__(self, exam_id: str, db_path: Path):
+        self.exam_id = exam_id
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        # Se incrementa con cada escritura; permite invalidar cachés derivadas
+        self.revision = 0
+
+        is_new = not db_path.exists()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS questions (
+                exam_id TEXT NOT NULL,
+                lang TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                start_page INTEGER,
+                end_page INTEGER,
+                markdown TEXT NOT NULL DEFAULT '',
+                markdown_full TEXT NOT NULL DEFAULT '',
+                updated_at REAL NOT NULL,
+                markdown_source TEXT,
+                PRIMARY KEY (exam_id, lang, number)
+            )
+            """
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(questions)")}
+        if "markdown_source" not in columns:
+            # Hash de las entradas del markdown (ver app.question_markdown)
+            self._conn.execute("ALTER TABLE questions ADD COLUMN markdown_source TEXT")
+        # Respuesta cruda del modelo de visión por (PDF, páginas, prompt, deployment)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                pdf_sha256 TEXT NOT NULL,
+                question_number INTEGER NOT NULL,
+                start_page INTEGER NOT NULL,
+                end_page INTEGER NOT NULL,
+                prompt_version INTEGER NOT NULL,
+                deployment TEXT NOT NULL,
+                response TEXT NOT NULL,
+                finish_reason TEXT,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_questions_lang_number ON questions (lang, number)"
+        )
+        self._conn.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+                title,
+                body,
+                exam_id UNINDEXED,
+                lang UNINDEXED,
+                number UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+            """
+        )
+        self._conn.commit()
+
+        if not is_new:
+            self._backfill_search_index()
+
+        if is_new:
+            imported = self.import_legacy(db_path.parent)
+            if imported:
+                print(f"Imported {imported} question files into {db_path}")
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> dict:
+        return {
+            "number": row["number"],
+            "data": json.loads(row["data"]),
+            "start_page": row["start_page"],
+            "end_page": row["end_page"],
+            "markdown": row["markdown"],
+            "markdown_full": row["markdown_full"],
+            "markdown_source": row["markdown_source"],
+            "updated_at": row["updated_at"],
+        }
+
+    def get(self, lang: str, number: int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM questions WHERE exam_id = ? AND lang = ? AND number = ?",
+                (self.exam_id, lang, number),
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def exists(self, lang: str, number: int) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM questions WHERE exam_id = ? AND lang = ? AND number = ?",
+                (self.exam_id, lang, number),
+            ).fetchone()
+        return row is not None
+
+    def list(
+        self, lang: str, start: Optional[int] = None, end: Optional[int] = None
+    ) -> List[dict]:
+        query = "SELECT * FROM questions WHERE exam_id = ? AND lang = ?"
+        params: list = [self.exam_id, lang]
+        if start is not None:
+            query += " AND number >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND number <= ?"
+            params.append(end)
+        query += " ORDER BY number"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row(row) for row in rows]
+
+    def markdown_versions(self, lang: str) -> List[tuple]:
+        # (number, updated_at) en orden, sin leer los markdowns
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT number, updated_at FROM questions "
+                "WHERE exam_id = ? AND lang = ? ORDER BY number",
+                (self.exam_id, lang),
+            ).fetchall()
+        return [(row["number"], row["updated_at"]) for row in rows]
+
+    def get_markdown(self, lang: str, number: int, full: bool = False) -> Optional[str]:
+        column = "markdown_full" if full else "markdown"
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {column} FROM questions WHERE exam_id = ? AND lang = ? AND number = ?",
+                (self.exam_id, lang, number),
+            ).fetchone()
+        return row[0] if row else None
+
+    def page_ranges(self, lang: str = "es") -> Dict[int, tuple]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT number, start_page, end_page FROM questions "
+                "WHERE exam_id = ? AND lang = ? AND start_page IS NOT NULL AND end_page IS NOT NULL",
+                (self.exam_id, lang),
+            ).fetchall()
+        return {row["number"]: (row["start_page"], row["end_page"]) for row in rows}
+
+    def _index_question(self, lang: str, number: int, data: dict):
+        title, body = _search_text(data)
+        self._conn.execute(
+            "DELETE FROM questions_fts WHERE exam_id = ? AND lang = ? AND number = ?",
+            (self.exam_id, lang, number),
+        )
+        self._conn.execute(
+            "INSERT INTO questions_fts VALUES (?, ?, ?, ?, ?)",
+            (title, body, self.exam_id, lang, number),
+        )
+
+    def _backfill_search_index(self):
+        # Bases creadas antes de existir el índice de búsqueda
+        with self._lock:
+            indexed = self._conn.execute("SELECT count(*) FROM questions_fts").fetchone()[0]
+            if indexed:
+                return
+            rows = self._conn.execute("SELECT lang, number, data FROM questions").fetchall()
+            if not rows:
+                return
+            with self._conn:
+                for row in rows:
+                    self._index_question(row["lang"], row["number"], json.loads(row["data"]))
+        print(f"Indexed {len(rows)} questions for search in {self.db_path}")
+
+    def search(self, query: str, lang: Optional[str] = None, limit: int = 20) -> List[dict]:
+        tokens = SEARCH_TOKEN_RE.findall(query)
+        if not tokens:
+            return []
+        # Frase por token; el último admite prefijo ("consist" -> "consistency")
+        terms = ['"' + token + '"' for token in tokens]
+        terms[-1] += "*"
+
+        sql = (
+            "SELECT lang, number, bm25(questions_fts, ?, ?) AS score, "
+            "snippet(questions_fts, -1, char(2), char(3), '…', 16) AS snippet "
+            "FROM questions_fts WHERE questions_fts MATCH ? AND exam_id = ?"
+        )
+        base_params: list = [*SEARCH_WEIGHTS]
+        filters: list = [self.exam_id]
+        if lang is not None:
+            sql += " AND lang = ?"
+            filters.append(lang)
+        sql += " ORDER BY score LIMIT ?"
+        filters.append(limit)
+
+        with self._lock:
+            # Primero todos los términos; si no hay resultados, cualquiera de ellos
+            for match in (" AND ".join(terms), " OR ".join(terms)):
+                rows = self._conn.execute(sql, base_params + [match] + filters).fetchall()
+                if rows:
+                    break
+        return [
+            {
+                "number": row["number"],
+                "lang": row["lang"],
+                "score": round(-row["score"], 4),
+                "snippet": _highlight(row["snippet"]),
+            }
+            for row in rows
+        ]
+
+    def _upsert(
+        self,
+        lang: str,
+        number: int,
+        data: dict,
+        markdown: str,
+        markdown_full: str,
+        updated_at: float,
+        markdown_source: Optional[str] = None,
+    ):
+        self._index_question(lang, number, data)
+        start_page, end_page = _page_range(data)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO questions (exam_id, lang, number, data, start_page, "
+            "end_page, markdown, markdown_full, updated_at, markdown_source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                self.exam_id,
+                lang,
+                number,
+                json.dumps(data, ensure_ascii=False),
+                start_page,
+                end_page,
+                markdown,
+                markdown_full,
+                updated_at,
+                markdown_source,
+            ),
+        )
+
+    def save(self, number: int, questions: Dict[str, tuple]):
+        # questions: {lang: (data, markdown, markdown_full, markdown_source)},
+        # en una sola transacción
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                for lang, (data, md, md_full, md_source) in questions.items():
+                    self._upsert(lang, number, data, md, md_full, now, md_source)
+            self.revision += 1
+
+    def update_markdown(self, rows: List[tuple]):
+        # rows: (lang, number, markdown, markdown_full, markdown_source)
+        if not rows:
+            return
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE questions SET markdown = ?, markdown_full = ?, markdown_source = ?, "
+                    "updated_at = ? WHERE exam_id = ? AND lang = ? AND number = ?",
+                    [
+                        (md, md_full, md_source, now, self.exam_id, lang, number)
+                        for lang, number, md, md_full, md_source in rows
+                    ],
+                )
+            self.revision += 1
+
+    def get_extraction(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_extraction(
+        self,
+        key: str,
+        pdf_sha256: str,
+        question_number: int,
+        start_page: int,
+        end_page: int,
+        prompt_version: int,
+        deployment: str,
+        response: str,
+        finish_reason: Optional[str],
+    ):
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        pdf_sha256,
+                        question_number,
+                        start_page,
+                        end_page,
+                        prompt_version,
+                        deployment,
+                        response,
+                        finish_reason,
+                        time.time(),
+                    ),
+                )
+
+    def import_legacy(self, exam_dir: Path) -> int:
+        imported = 0
+        with self._lock:
+            with self._conn:
+                for lang in LANGS:
+                    json_dir = exam_dir / "questions_json" / lang
+                    md_dir = exam_dir / "questions_md" / lang
+                    if not json_dir.exists():
+                        continue
+                    for json_file in json_dir.glob("*.json"):
+                        if not json_file.stem.isdigit():
+                            continue
+                        try:
+                            with open(json_file, "r", encoding="utf-8") as f:
+                                data = json.load(f)
+                        except Exception as e:
+                            print(f"Error reading {json_file}: {e}")
+                            continue
+                        md_path = md_dir / f"{json_file.stem}.md"
+                        md_full_path = md_dir / f"{json_file.stem}_full.md"
+                        self._upsert(
+                            lang,
+                            int(json_file.stem),
+                            data,
+                            md_path.read_text(encoding="utf-8") if md_path.exists() else "",
+                            md_full_path.read_text(encoding="utf-8") if md_full_path.exists() else "",
+                            json_file.stat().st_mtime,
+                        )
+                        imported += 1
+            self.revision += 1
+        return imported
+
+    def data_version(self) -> tuple:
+        # Cambia con cada escritura propia (revision) o de otra conexión/proceso
+        with self._lock:
+            external = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return self.revision, external
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _highlight(snippet: str) -> str:
+    # Se escapa el texto y luego se convierten los marcadores en <mark>
+    return html.escape(snippet).replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+
+def _search_text(data: dict) -> tuple:
+    options = " ".join(str(opt.get("text") or "") for opt in data.get("options") or [])
+    body = [
+        data.get("question_context"),
+        options,
+        data.get("explanation"),
+        data.get("community_discussion"),
+        data.get("image_explanation"),
+    ]
+    return str(data.get("short_question") or ""), "\n".join(str(part) for part in body if part)
+
+
+def _page_range(data: dict) -> tuple:
+    start_page = data.get("start_page")
+    end_page = data.get("end_page")
+    if not (start_page and end_page):
+        # Archivos antiguos con el campo 'pages' ("18-19")
+        start_page, _, end_page = str(data.get("pages", "")).partition("-")
+    try:
+        return int(start_page), int(end_page)
+    except (TypeError, ValueError):
+        return None, None
+
+
+_stores: Dict[str, QuestionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_question_store(exam_id: str, create: bool = True) -> Optional[QuestionStore]:
+    if Path(exam_id).name != exam_id or exam_id in ("", ".", ".."):
+        raise InvalidExamId(f"Invalid exam id: {exam_id}")
+
+    with _stores_lock:
+        store = _stores.get(exam_id)
+        if store is None:
+            exam_dir = DATA_DIR / exam_id
+            db_path = exam_dir / STORE_FILENAME
+            # Solo lectura: no crear bases para exámenes que no existen
+            if not create and not db_path.exists() and not (exam_dir / "questions_json").is_dir():
+                return None
+            store = QuestionStore(exam_id, db_path)
+            _stores[exam_id] = store
+        return store
+
+
+def close_all():
+    with _stores_lock:
+        for store in _stores.values():
+            store.close()
+        _stores.clear()
+
+
+if __name__ == "__main__":
+    # Importador: python -m app.question_store [exam_id ...]
+    import sys
+
+    exam_ids = sys.argv[1:] or sorted(
+        d.name for d in DATA_DIR.iterdir() if (d / "questions_json").is_dir()
+    )
+    for exam_id in exam_ids:
+        store = get_question_store(exam_id)
+        count = store.import_legacy(DATA_DIR / exam_id)
+        print(f"{exam_id}: {count} question files imported into {store.db_path}")
@@ -0,0 +1,315 @@
+import base64
+import io
+import math
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Set, Tuple
+
+import pypdfium2 as pdfium
+from PIL import Image
+
+from app import metrics
+from app.documents import pdfium_lock, pdfium_pool, plumber_pool
+from app.lru import LRUCache
+from app.pdf_index import file_sha256, write_atomic
+
+# Caché de imágenes renderizadas, direccionada por contenido:
+# (hash del PDF, página, opciones de render). Nivel en memoria (LRU con
+# presupuesto de bytes) delante de un nivel en disco en DATA_DIR/.render_cache.
+# El nivel en disco también tiene presupuesto (0 = sin límite): al superarlo se
+# borran las imágenes usadas hace más tiempo hasta bajar a RENDER_CACHE_PRUNE_TO.
+RENDER_CACHE_MEMORY_BYTES = int(os.getenv("RENDER_CACHE_MEMORY_MB", "128")) * 1024 * 1024
+RENDER_CACHE_DISK_BYTES = int(os.getenv("RENDER_CACHE_DISK_MB", "2048")) * 1024 * 1024
+RENDER_CACHE_PRUNE_TO = 0.8
+RENDER_CACHE_DIR = Path(__file__).parent / "data" / ".render_cache"
+
+# Backend de render: "pdfium" (rápido, nativo) o "pdfplumber" (ruta original)
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "pdfium")
+RENDER_FORMAT = os.getenv("RENDER_FORMAT", "png")
+RENDER_QUALITY = int(os.getenv("RENDER_QUALITY", "85"))
+RENDER_GRAYSCALE = os.getenv("RENDER_GRAYSCALE", "false").lower() in ("1", "true", "yes")
+RENDER_MAX_PIXELS = int(os.getenv("RENDER_MAX_PIXELS", "6000000"))
+# Sin antialiasing (como el to_image() original de pdfplumber) las páginas tienen
+# pocos colores y el PNG comprime varias veces mejor; con paleta adaptativa
+# (PNG de 8 bits, 0 = color verdadero) se reduce otro ~30% sin perder el color.
+RENDER_ANTIALIAS = os.getenv("RENDER_ANTIALIAS", "false").lower() in ("1", "true", "yes")
+RENDER_PNG_COLORS = int(os.getenv("RENDER_PNG_COLORS", "256"))
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+@dataclass(frozen=True)
+class RenderOptions:
+    dpi: int
+    fmt: str = RENDER_FORMAT
+    quality: int = RENDER_QUALITY
+    grayscale: bool = RENDER_GRAYSCALE
+    max_pixels: int = RENDER_MAX_PIXELS
+    backend: str = RENDER_BACKEND
+    antialias: bool = RENDER_ANTIALIAS
+    png_colors: int = RENDER_PNG_COLORS
+    # Puntos PDF recortados de cada borde: (izquierda, abajo, derecha, arriba)
+    crop: Tuple[int, int, int, int] = (0, 0, 0, 0)
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.fmt]
+
+    @property
+    def cache_tag(self) -> str:
+        tag = f"{self.backend}_{self.dpi}"
+        if self.fmt != "png":
+            tag += f"_q{self.quality}"
+        if self.grayscale:
+            tag += "_gray"
+        elif self.fmt == "png" and self.png_colors:
+            tag += f"_p{self.png_colors}"
+        if self.antialias:
+            tag += "_aa"
+        if self.max_pixels:
+            tag += f"_mp{self.max_pixels}"
+        if any(self.crop):
+            tag += "_c" + "-".join(str(v) for v in self.crop)
+        return tag
+
+
+class RenderCache:
+    def __init__(self, max_bytes: int, cache_dir: Path, max_disk_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: LRUCache[bytes] = LRUCache(max_bytes=max_bytes)
+        # Tamaño del nivel en disco; se calcula al primer put
+        self._disk_bytes: Optional[int] = None
+        self._prune_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: tuple) -> Path:
+        pdf_hash, page_idx, options = key
+        return self.cache_dir / pdf_hash / f"{page_idx + 1}_{options.cache_tag}.{options.fmt}"
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        data = self._memory.get(key)
+        if data is not None:
+            return data
+
+        disk_path = self._disk_path(key)
+        try:
+            data = disk_path.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+        try:
+            # El mtime marca el último uso para la poda del nivel en disco
+            os.utime(disk_path)
+        except OSError:
+            pass
+        self._memory.put(key, data)
+        return data
+
+    def put(self, key: tuple, data: bytes):
+        self._memory.put(key, data)
+        try:
+            write_atomic(self._disk_path(key), data)
+        except OSError as e:
+            print(f"Error writing render cache {self._disk_path(key)}: {e}")
+            return
+
+        if not self.max_disk_bytes:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data)
+            over_budget = self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self.prune_disk()
+
+    def prune_disk(self, live_hashes: Optional[Set[str]] = None) -> int:
+        # Borra los PDFs que ya no existen (si se indican los vigentes) y, por
+        # encima del presupuesto, las imágenes menos usadas. Devuelve los bytes liberados.
+        if not self._prune_lock.acquire(blocking=False):
+            return 0
+        try:
+            files, freed = [], 0
+            for pdf_dir in self.cache_dir.glob("*"):
+                if not pdf_dir.is_dir():
+                    continue
+                stale = live_hashes is not None and pdf_dir.name not in live_hashes
+                for path in pdf_dir.iterdir():
+                    try:
+                        stat = path.stat()
+                        if stale:
+                            path.unlink()
+                            freed += stat.st_size
+                        else:
+                            files.append((stat.st_mtime, stat.st_size, path))
+                    except OSError:
+                        continue
+                if stale:
+                    _remove_empty_dir(pdf_dir)
+
+            total = sum(size for _, size, _ in files)
+            if self.max_disk_bytes and total > self.max_disk_bytes:
+                target = self.max_disk_bytes * RENDER_CACHE_PRUNE_TO
+                for _, size, path in sorted(files, key=lambda f: f[0]):
+                    if total <= target:
+                        break
+                    try:
+                        path.unlink()
+                    except OSError:
+                        continue
+                    total -= size
+                    freed += size
+                    _remove_empty_dir(path.parent)
+
+            with self._lock:
+                self._disk_bytes = total
+            return freed
+        finally:
+            self._prune_lock.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "bytes": self._memory.bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "memory_hits": self._memory.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+def _remove_empty_dir(path: Path):
+    try:
+        path.rmdir()
+    except OSError:
+        pass
+
+
+render_cache = RenderCache(RENDER_CACHE_MEMORY_BYTES, RENDER_CACHE_DIR, RENDER_CACHE_DISK_BYTES)
+
+
+def prune_render_cache(pdf_paths: Sequence[Path]) -> int:
+    # Al arrancar: descarta las imágenes de PDFs que ya no están en DATA_DIR
+    return render_cache.prune_disk({file_sha256(path) for path in pdf_paths})
+
+
+def encode_image(image, options: RenderOptions) -> bytes:
+    with metrics.stage("encode"):
+        return _encode_image(image, options)
+
+
+def _encode_image(image, options: RenderOptions) -> bytes:
+    if options.grayscale and image.mode != "L":
+        image = image.convert("L")
+    elif options.fmt in ("jpeg", "webp") and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    if options.fmt == "png":
+        if options.png_colors and image.mode != "L":
+            image = image.convert("RGB").quantize(options.png_colors, method=Image.Quantize.FASTOCTREE)
+        image.save(buffer, format="PNG")
+    elif options.fmt == "jpeg":
+        image.save(buffer, format="JPEG", quality=options.quality, optimize=True)
+    elif options.fmt == "webp":
+        image.save(buffer, format="WEBP", quality=options.quality, method=4)
+    else:
+        raise ValueError(f"Unsupported render format: {options.fmt}")
+    return buffer.getvalue()
+
+
+def _scale_for(width: float, height: float, options: RenderOptions) -> float:
+    left, bottom, right, top = options.crop
+    width, height = width - left - right, height - bottom - top
+    scale = options.dpi / 72
+    if options.max_pixels:
+        pixels = width * height * scale * scale
+        if pixels > options.max_pixels:
+            scale *= math.sqrt(options.max_pixels / pixels)
+    return scale
+
+
+def render_page_pdfium(pdf: "pdfium.PdfDocument", page_idx: int, options: RenderOptions) -> bytes:
+    # La codificación de la imagen (PIL) queda fuera del lock de pdfium
+    with pdfium_lock, metrics.stage("render"):
+        page = pdf[page_idx]
+        try:
+            width, height = page.get_size()
+            smooth = options.antialias
+            bitmap = page.render(
+                scale=_scale_for(width, height, options),
+                crop=options.crop,
+                grayscale=options.grayscale,
+                no_smoothtext=not smooth,
+                no_smoothimage=not smooth,
+                no_smoothpath=not smooth,
+            )
+            image = bitmap.to_pil()
+        finally:
+            page.close()
+    return encode_image(image, options)
+
+
+def render_page_pdfplumber(pdf, page_idx: int, options: RenderOptions) -> bytes:
+    with metrics.stage("render"):
+        page = pdf.pages[page_idx]
+        try:
+            width, height = float(page.width), float(page.height)
+            resolution = _scale_for(width, height, options) * 72
+            region = page
+            if any(options.crop):
+                left, bottom, right, top = options.crop
+                region = page.crop((left, top, width - right, height - bottom))
+            # to_image() rasteriza con pdfium, que no es seguro entre hilos
+            with pdfium_lock:
+                im = region.to_image(resolution=resolution, antialias=options.antialias)
+        finally:
+            page.close()
+    return encode_image(im.original, options)
+
+
+def render_pages(pdf_path: Path, page_indices: List[int], options: RenderOptions) -> List[bytes]:
+    return render_page_plan(pdf_path, [(i, options) for i in page_indices])
+
+
+def render_page_plan(pdf_path: Path, plan: Sequence[Tuple[int, RenderOptions]]) -> List[bytes]:
+    # plan: (página, opciones) por imagen; todas con el mismo backend
+    if not plan:
+        return []
+    backend = plan[0][1].backend
+    render_page = render_page_pdfium if backend == "pdfium" else render_page_pdfplumber
+    pool = pdfium_pool if backend == "pdfium" else plumber_pool
+    pdf_hash = file_sha256(pdf_path)
+    keys = [(pdf_hash, i, options) for i, options in plan]
+    images = [render_cache.get(key) for key in keys]
+
+    # Solo tomamos el documento del pool si alguna página no está en caché
+    missing = [pos for pos, data in enumerate(images) if data is None]
+    if missing:
+        with pool.acquire(pdf_path) as pdf:
+            for pos in missing:
+                page_idx, options = plan[pos]
+                images[pos] = render_page(pdf, page_idx, options)
+                render_cache.put(keys[pos], images[pos])
+    return images
+
+
+def data_url(data: bytes, options: RenderOptions) -> str:
+    with metrics.stage("base64"):
+        return f"data:{options.mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def render_pages_data_urls(pdf_path: Path, page_indices: List[int], dpi: int) -> List[str]:
+    options = RenderOptions(dpi=dpi)
+    return [data_url(data, options) for data in render_pages(pdf_path, page_indices, options)]
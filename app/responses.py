@@ -0,0 +1,89 @@
+import gzip
+import json
+import os
+from typing import Dict, Iterable, Optional, Set
+
+from fastapi.responses import Response
+
+from app.lru import LRUCache
+
+try:
+    import orjson
+except ImportError:  # opcional: sin orjson se usa json de la librería estándar
+    orjson = None
+
+# Respuestas JSON grandes (/questions con limit=0, /analyze-pages): se
+# serializan a bytes con orjson y se comprimen con gzip si el cliente lo acepta.
+# El gzip de los cuerpos con ETag se guarda en una LRU para no recomprimir
+# páginas que no cambiaron.
+JSON_GZIP_MIN_SIZE = int(os.getenv("JSON_GZIP_MIN_SIZE", "1400"))
+JSON_GZIP_LEVEL = int(os.getenv("JSON_GZIP_LEVEL", "6"))
+JSON_GZIP_CACHE_MB = int(os.getenv("JSON_GZIP_CACHE_MB", "32"))
+
+
+def dumps(obj) -> bytes:
+    # Mismo formato que JSONResponse: UTF-8 sin escapar y sin espacios
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Set[str]:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    # ETag fuerte distinto por representación
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match: Optional[str], candidates: Iterable[str]) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return bool(tags & set(candidates))
+
+
+gzip_cache: LRUCache[bytes] = LRUCache(max_bytes=JSON_GZIP_CACHE_MB * 1024 * 1024)
+
+
+def gzip_cache_stats() -> dict:
+    return dict(gzip_cache.stats(), encoder="orjson" if orjson is not None else "json")
+
+
+def gzip_body(body: bytes, etag: Optional[str] = None) -> bytes:
+    compressed = gzip_cache.get(etag) if etag else None
+    if compressed is None:
+        compressed = gzip.compress(body, compresslevel=JSON_GZIP_LEVEL, mtime=0)
+        if etag:
+            gzip_cache.put(etag, compressed)
+    return compressed
+
+
+def json_response(
+    body: bytes,
+    accept_encoding: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+    etag: Optional[str] = None,
+    if_none_match: Optional[str] = None,
+) -> Response:
+    headers = dict(headers or {})
+    compress = len(body) >= JSON_GZIP_MIN_SIZE
+    encoding = "gzip" if compress and "gzip" in accepted_encodings(accept_encoding) else None
+    if compress:
+        headers["Vary"] = "Accept-Encoding"
+    if etag:
+        headers["ETag"] = variant_etag(etag, encoding)
+        if etag_matches(if_none_match, (etag, variant_etag(etag, "gzip"))):
+            return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        body = gzip_body(body, etag)
+    return Response(content=body, media_type="application/json", headers=headers)
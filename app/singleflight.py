@@ -0,0 +1,42 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+# Coalescencia de peticiones en curso ("single-flight"): la primera petición con
+# una clave ejecuta el trabajo y las que llegan mientras tanto esperan el mismo
+# resultado (o la misma excepción). El trabajo corre en su propia tarea, así que
+# si el cliente que lo inició se desconecta los demás siguen esperando.
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self._tasks.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._tasks
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # evita el aviso si nadie quedó esperando
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._tasks),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.responses import accepted_encodings, etag_matches, variant_etag
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se sirve gzip
+    brotli = None
+
+# Manifiesto del build de Ionic (frontend/www) construido al arrancar: ETag,
+# tipo MIME y variantes gzip/brotli de cada archivo. Se usan las variantes
+# .gz/.br del propio build si existen; si no, cada variante se comprime la
+# primera vez que se pide y queda en memoria. Las peticiones se resuelven contra
+# el manifiesto sin tocar el disco: los archivos sin hash de contenido se sirven
+# con los bytes leídos al cargarlo, para que cuerpo, tamaño y ETag no se
+# separen si alguien reescribe el archivo; los que llevan hash no cambian y se
+# envían desde disco.
+#
+# Tras recompilar el frontend (ng build) hay que recargar el manifiesto con
+# POST /health/static/reload o reiniciar el servidor.
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "application/xml",
+    "image/svg+xml",
+)
+MIN_COMPRESS_SIZE = 1024
+# Calidad 11 tarda segundos por bundle; 5 comprime casi igual en milisegundos
+BROTLI_QUALITY = int(os.getenv("STATIC_BROTLI_QUALITY", "5"))
+GZIP_LEVEL = 6
+
+# Bundles de Angular con hash de contenido: main-2ZDOXOKG.js, chunk-AB12CD34.js
+HASHED_NAME_RE = re.compile(r"[.-](?=[A-Za-z0-9]*\d)[A-Za-z0-9]{8,20}\.\w+$")
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+mimetypes.add_type("application/javascript", ".mjs")
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+
+
+@dataclass
+class StaticAsset:
+    path: Path
+    size: int
+    media_type: str
+    etag: str
+    cache_control: str
+    stat: object
+    # Contenido en memoria de los archivos sin hash (None: se envía desde disco)
+    data: Optional[bytes] = None
+    # Codificaciones posibles; el valor es None hasta comprimirla por primera vez
+    encoded: Dict[str, Optional[bytes]] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        return variant_etag(self.etag, encoding)
+
+    def get_encoded(self, encoding: str) -> Optional[bytes]:
+        with self._lock:
+            if encoding not in self.encoded:
+                return None
+            data = self.encoded[encoding]
+            if data is None:
+                source = self.data if self.data is not None else self.path.read_bytes()
+                data = _compress(source, encoding)
+                if data is None:
+                    # No compensa: se sirve sin comprimir
+                    del self.encoded[encoding]
+                else:
+                    self.encoded[encoding] = data
+            return data
+
+
+def _compress(data: bytes, encoding: str) -> Optional[bytes]:
+    if encoding == "gzip":
+        encoded = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        encoded = brotli.compress(data, quality=BROTLI_QUALITY)
+    return encoded if len(encoded) < len(data) else None
+
+
+def _load_precompressed(path: Path) -> Dict[str, Optional[bytes]]:
+    # Variantes generadas por el propio build (archivo.js.gz / archivo.js.br)
+    encoded = {}
+    for encoding, suffix in (("gzip", ".gz"), ("br", ".br")):
+        candidate = path.with_name(path.name + suffix)
+        if candidate.is_file():
+            encoded[encoding] = candidate.read_bytes()
+    return encoded
+
+
+class StaticManifest:
+    def __init__(self, root: Path):
+        self.root = root
+        self.assets: Dict[str, StaticAsset] = {}
+        self.index: Optional[StaticAsset] = None
+
+    def load(self):
+        start = time.perf_counter()
+        assets = {}
+        if self.root.is_dir():
+            for path in sorted(self.root.rglob("*")):
+                if not path.is_file() or path.suffix in (".gz", ".br"):
+                    continue
+                rel = path.relative_to(self.root).as_posix()
+                assets[rel] = self._build_asset(rel, path)
+        self.assets = assets
+        self.index = assets.get("index.html")
+        if assets:
+            print(
+                f"Static manifest: {len(assets)} files from {self.root} "
+                f"in {time.perf_counter() - start:.2f}s (brotli: {brotli is not None})"
+            )
+
+    def _build_asset(self, rel: str, path: Path) -> StaticAsset:
+        stat = path.stat()
+        data = path.read_bytes()
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+        encoded = _load_precompressed(path)
+        if not encoded and len(data) >= MIN_COMPRESS_SIZE and media_type.startswith(COMPRESSIBLE_TYPES):
+            encoded = {"gzip": None}
+            if brotli is not None:
+                encoded["br"] = None
+
+        hashed = rel != "index.html" and bool(HASHED_NAME_RE.search(path.name))
+        return StaticAsset(
+            path=path,
+            size=len(data),
+            media_type=media_type,
+            etag=f'"{hashlib.sha256(data).hexdigest()[:32]}"',
+            cache_control=IMMUTABLE_CACHE if hashed else REVALIDATE_CACHE,
+            stat=stat,
+            data=None if hashed else data,
+            encoded=encoded,
+        )
+
+    def resolve(self, full_path: str) -> Optional[StaticAsset]:
+        # Ruta exacta del build o, para rutas del SPA (/home), index.html
+        return self.assets.get(full_path.strip("/")) or self.index
+
+    def stats(self) -> dict:
+        return {
+            "root": str(self.root),
+            "files": len(self.assets),
+            "bytes": sum(asset.size for asset in self.assets.values()),
+            "memory_bytes": sum(len(a.data or b"") for a in self.assets.values()),
+            "gzip_bytes": sum(len(a.encoded.get("gzip") or b"") for a in self.assets.values()),
+            "br_bytes": sum(len(a.encoded.get("br") or b"") for a in self.assets.values()),
+            "brotli_available": brotli is not None,
+        }
+
+
+def choose_encoding(asset: StaticAsset, accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding or not asset.encoded:
+        return None
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if encoding in accepted or "*" in accepted:
+            if asset.get_encoded(encoding) is not None:
+                return encoding
+    return None
+
+
+def asset_etag_matches(if_none_match: Optional[str], asset: StaticAsset) -> bool:
+    candidates = [asset.variant_etag(None)] + [asset.variant_etag(e) for e in list(asset.encoded)]
+    return etag_matches(if_none_match, candidates)
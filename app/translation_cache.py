@@ -0,0 +1,107 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Optional
+
+from app.lru import LRUCache
+
+# Caché persistente de traducciones de texto libre (/translate).
+# Clave: texto normalizado + deployment del modelo + versión del prompt.
+# LRU en memoria delante de una base SQLite local.
+TRANSLATION_CACHE_MEMORY_ITEMS = int(os.getenv("TRANSLATION_CACHE_MEMORY_ITEMS", "2048"))
+TRANSLATION_CACHE_PATH = Path(__file__).parent / "data" / ".cache" / "translations.sqlite3"
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class TranslationCache:
+    def __init__(self, db_path: Path, max_items: int):
+        self.db_path = db_path
+        self.max_items = max_items
+        self._memory: LRUCache[str] = LRUCache(max_items=max_items)
+        self._lock = threading.Lock()
+        self._conn = None
+        self.db_hits = 0
+        self.misses = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS translations (
+                    key TEXT PRIMARY KEY,
+                    deployment TEXT NOT NULL,
+                    prompt_version INTEGER NOT NULL,
+                    source_text TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+        return self._conn
+
+    @staticmethod
+    def make_key(text: str, deployment: str, prompt_version: int) -> str:
+        raw = f"{deployment}\0{prompt_version}\0{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        translation = self._memory.get(key)
+        if translation is not None:
+            return translation
+
+        with self._lock:
+            row = self._db().execute(
+                "SELECT translation FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.db_hits += 1
+        self._memory.put(key, row[0])
+        return row[0]
+
+    def put(self, key: str, text: str, deployment: str, prompt_version: int, translation: str):
+        self._memory.put(key, translation)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)",
+                (key, deployment, prompt_version, text, translation, time.time()),
+            )
+            db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            memory_hits = self._memory.hits
+            lookups = memory_hits + self.db_hits + self.misses
+            return {
+                "memory_items": len(self._memory),
+                "max_memory_items": self.max_items,
+                "memory_hits": memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_ratio": round((memory_hits + self.db_hits) / lookups, 4)
+                if lookups
+                else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+translation_cache = TranslationCache(TRANSLATION_CACHE_PATH, TRANSLATION_CACHE_MEMORY_ITEMS)
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+# Pool acotado para el trabajo de CPU con PDFs (extract_text, render, PNG).
+# Si la cola está llena respondemos 503 + Retry-After en lugar de acumular latencia.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or os.cpu_count() or 1
+PDF_QUEUE_LIMIT = int(os.getenv("PDF_QUEUE_LIMIT", "32"))
+PDF_RETRY_AFTER = int(os.getenv("PDF_RETRY_AFTER", "5"))
+
+
+class QueueFullError(HTTPException):
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail="Server busy processing PDFs, retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, workers: int, max_pending: int, retry_after: int):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise QueueFullError(self.retry_after)
+            self._pending += 1
+
+        submitted = time.perf_counter()
+
+        # El hueco en la cola lo libera el hilo al terminar, no quien espera:
+        # si el cliente se va, la tarea sigue ocupando el pool hasta acabar
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                wait = started - submitted
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._pending -= 1
+                    self._completed += 1
+                    self._run_total += time.perf_counter() - started
+
+        def release_if_cancelled(future):
+            # Cancelada antes de arrancar: task() nunca correrá
+            if future.cancelled():
+                with self._lock:
+                    self._pending -= 1
+
+        future = self._executor.submit(task)
+        future.add_done_callback(release_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._wait_total / self._completed * 1000, 2)
+                if self._completed
+                else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 2),
+                "avg_run_ms": round(self._run_total / self._completed * 1000, 2)
+                if self._completed
+                else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+pdf_executor = BoundedExecutor("pdf", PDF_WORKERS, PDF_QUEUE_LIMIT, PDF_RETRY_AFTER)
+
+
+async def run_pdf_task(fn, *args, **kwargs):
+    return await pdf_executor.run(fn, *args, **kwargs)
@@ -0,0 +1,122 @@
+"""Compara la serialización JSON por defecto de FastAPI con orjson + gzip.
+
+Uso:
+    python -m benchmarks.json_benchmark --exam az-204 --lang es
+    python -m benchmarks.json_benchmark --count 470
+
+Con --exam usa el catálogo real de /questions (limit=0); sin él genera un
+catálogo sintético con --count preguntas. También mide un resultado de
+/analyze-pages del mismo tamaño. Para cada variante mide el tiempo de
+serialización (+ compresión) y los bytes que salen por la red; la variante
+"cached gzip" solo aplica a /questions, la única de las dos con ETag.
+"""
+import argparse
+import gzip
+import random
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.question_catalog import QUESTION_FIELDS, get_catalog
+from app.responses import JSON_GZIP_LEVEL, dumps, orjson
+
+
+VOCABULARY = (
+    "Azure Functions Blob Storage Cosmos DB consistencia Session Strong Eventual "
+    "App Service Key Vault Managed Identity Event Grid Service Bus cola mensaje "
+    "contenedor partición throughput RU latencia réplica región despliegue slot "
+    "configurar habilitar necesitas solución requisito coste escalar trigger binding"
+).split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words)) + "."
+
+
+def synthetic_questions(count: int):
+    # Texto pseudoaleatorio para que gzip no comprima de forma irreal
+    rng = random.Random(42)
+    return [
+        {
+            "numero": str(n),
+            "pregunta": sentence(rng, 40),
+            "opciones": [
+                {"letra": letter, "texto": sentence(rng, 10), "es_correcta": letter == "B"}
+                for letter in "ABCD"
+            ],
+            "respuesta_correcta": "B",
+            "explicacion": sentence(rng, 120),
+        }
+        for n in range(1, count + 1)
+    ]
+
+
+def analyze_results(count: int):
+    return [
+        {"question": n, "start_page": 18 + n, "end_page": 19 + n, "status": "Found"}
+        for n in range(1, count + 1)
+    ]
+
+
+def measure(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        data = fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, len(data)
+
+
+def run_payload(name: str, payload, repeat: int, etag_cached: bool = True):
+    cached_body = dumps(payload)
+    cached_gzip = gzip.compress(cached_body, compresslevel=JSON_GZIP_LEVEL, mtime=0)
+    variants = {
+        "fastapi default (actual)": lambda: JSONResponse(jsonable_encoder(payload)).body,
+        "json.dumps": lambda: JSONResponse(payload).body,
+        "orjson" if orjson else "dumps (sin orjson)": lambda: dumps(payload),
+        f"dumps + gzip {JSON_GZIP_LEVEL}": lambda: gzip.compress(
+            dumps(payload), compresslevel=JSON_GZIP_LEVEL, mtime=0
+        ),
+    }
+    # Solo las rutas que responden con ETag reutilizan el gzip ya calculado
+    if etag_cached:
+        variants["cached gzip (ETag hit)"] = lambda: cached_gzip
+
+    print(f"\n{name}: {len(payload)} items, {len(cached_body) / 1024:.1f} KB JSON, {repeat} runs")
+    print(f"{'variant':<28}{'ms':>10}{'KB wire':>10}{'speedup':>12}{'size':>8}")
+    baseline = None
+    for label, fn in variants.items():
+        ms, size = measure(fn, repeat)
+        baseline = baseline or (ms, size)
+        print(
+            f"{label:<28}{ms:>10.3f}{size / 1024:>10.1f}"
+            f"{baseline[0] / max(ms, 1e-6):>11.1f}x{size / baseline[1]:>8.0%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--exam", help="exam id with a question store or legacy JSON")
+    parser.add_argument("--lang", default="es", choices=("es", "en"))
+    parser.add_argument("--count", type=int, default=470)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.exam:
+        catalog = get_catalog(args.exam, args.lang)
+        if catalog is None:
+            parser.error(f"No questions found for {args.exam} ({args.lang})")
+        questions = [{name: q.get(name) for name in QUESTION_FIELDS} for q in catalog.questions]
+        source = f"/questions/{args.exam}?lang={args.lang}&limit=0"
+    else:
+        questions = synthetic_questions(args.count)
+        source = "/questions (synthetic, limit=0)"
+
+    run_payload(source, questions, args.repeat)
+    run_payload("/analyze-pages", analyze_results(len(questions)), args.repeat, etag_cached=False)
+
+
+if __name__ == "__main__":
+    main()
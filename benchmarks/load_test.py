@@ -0,0 +1,146 @@
+"""Prueba de carga de la API: latencias p50/p95/p99 y throughput por ruta.
+
+Uso (con la API arrancada contra benchmarks.mock_azure_openai):
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 \\
+        --concurrency 16 --requests 400 --questions 1-50
+
+Lanza --concurrency clientes que eligen un escenario al azar según --mix
+(translate-question, questions, analyze-pages, readme) hasta completar
+--requests peticiones o agotar --duration segundos. /translate-question solo
+llama al modelo la primera vez por pregunta; después responde desde el almacén.
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+SCENARIOS = ("translate-question", "questions", "analyze-pages", "readme")
+
+
+def parse_range(value: str):
+    start, _, end = value.partition("-")
+    return int(start), int(end or start)
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Rango más cercano: el menor valor que deja al menos pct% de muestras por debajo o igual
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def build_request(name: str, args, rng: random.Random):
+    first, last = args.question_range
+    if name == "translate-question":
+        body = {"question_number": str(rng.randint(first, last)), "pdf_filename": args.pdf}
+        return "POST", "/translate-question", {"json": body}
+    if name == "questions":
+        params = {"lang": rng.choice(("es", "en")), "limit": rng.choice((10, 50, 0))}
+        return "GET", f"/questions/{args.exam}", {"params": params}
+    if name == "analyze-pages":
+        params = {"start_question": first, "end_question": last, "pdf_filename": args.pdf}
+        return "GET", "/analyze-pages", {"params": params}
+    params = {"lang": rng.choice(("es", "en")), "full": rng.choice(("true", "false"))}
+    return "GET", f"/questions-md/{args.exam}/README.md", {"params": params}
+
+
+async def worker(client, args, rng, deadline, counter, results):
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    while time.monotonic() < deadline:
+        if counter["issued"] >= args.requests:
+            return
+        counter["issued"] += 1
+        name = rng.choices(names, weights)[0]
+        method, path, kwargs = build_request(name, args, rng)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            await response.aread()
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        results[name].append((time.perf_counter() - started, status))
+
+
+def report(results: dict, elapsed: float):
+    print(f"\n{'scenario':<20}{'reqs':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    everything = []
+    for name in SCENARIOS:
+        samples = results.get(name)
+        if not samples:
+            continue
+        everything.extend(samples)
+        print_row(name, samples, elapsed)
+    print_row("total", everything, elapsed)
+
+    statuses = Counter(status for samples in results.values() for _, status in samples)
+    print("\nstatus codes: " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items(), key=str)))
+
+
+def print_row(name: str, samples: list, elapsed: float):
+    latencies = sorted(latency * 1000 for latency, _ in samples)
+    errors = sum(1 for _, status in samples if not (isinstance(status, int) and status < 400))
+    print(
+        f"{name:<20}{len(samples):>7}{errors:>8}"
+        f"{percentile(latencies, 50):>10.1f}{percentile(latencies, 95):>10.1f}"
+        f"{percentile(latencies, 99):>10.1f}{len(samples) / elapsed:>9.1f}"
+    )
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    results = defaultdict(list)
+    counter = {"issued": 0}
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(
+            *(
+                worker(client, args, random.Random(args.seed + i), deadline, counter, results)
+                for i in range(args.concurrency)
+            )
+        )
+        elapsed = time.monotonic() - started
+    print(f"{counter['issued']} requests, concurrency {args.concurrency}, {elapsed:.1f}s")
+    report(results, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--exam", default="az-204")
+    parser.add_argument("--pdf", default="az-204.pdf")
+    parser.add_argument("--questions", dest="question_range", type=parse_range, default=(1, 50))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--duration", type=float, default=300, help="seconds")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix("translate-question=1,questions=4,analyze-pages=2,readme=1"),
+        help="scenario=weight,... (translate-question, questions, analyze-pages, readme)",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
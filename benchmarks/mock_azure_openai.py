@@ -0,0 +1,239 @@
+"""Servidor local que imita el endpoint de chat completions de Azure OpenAI.
+
+Uso:
+    python -m benchmarks.mock_azure_openai --port 8100 --latency-ms 800 --rate-429 0.05
+
+y arrancar la API apuntando a él:
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8100 AZURE_OPENAI_API_KEY=mock \\
+        uvicorn app.main:app --port 8000
+
+Responde a POST /openai/deployments/{deployment}/chat/completions con:
+- extracción de preguntas (prompt con "Question #N"): JSON {"en": ..., "es": ...}
+  sintético o el de --payload, con el número y las páginas tomados del prompt;
+- cualquier otra petición: el texto del usuario con el prefijo "[es] ".
+Soporta stream=true (SSE por fragmentos), latencia configurable con jitter e
+inyección de 429 con Retry-After. GET /stats devuelve los contadores.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+QUESTION_RE = re.compile(r"Question #(\d+)")
+PAGES_RE = re.compile(r"pages (\d+)-(\d+)")
+
+app = FastAPI()
+config = argparse.Namespace(
+    latency_ms=500.0,
+    jitter_ms=200.0,
+    rate_429=0.0,
+    retry_after_ms=1000,
+    stream_chunk_ms=20.0,
+    stream_chunks=40,
+    payload=None,
+)
+stats = {"requests": 0, "streamed": 0, "throttled": 0, "in_flight": 0, "max_in_flight": 0}
+
+
+def synthetic_question(number: int, start_page: int, end_page: int, lang: str) -> dict:
+    es = lang == "es"
+    return {
+        "id_question": number,
+        "start_page": start_page,
+        "end_page": end_page,
+        "short_question": (
+            f"Pregunta {number}: configurar Azure Functions con Blob Storage"
+            if es
+            else f"Question {number}: configure Azure Functions with Blob Storage"
+        ),
+        "question_context": ("Contexto de la pregunta. " if es else "Question context. ") * 20,
+        "image_explanation": None,
+        "community_discussion": (
+            "La comunidad coincide con la respuesta." if es else "The community agrees with the answer."
+        )
+        if number % 2
+        else None,
+        "options": [
+            {
+                "letter": letter,
+                "text": f"{'Opción' if es else 'Option'} {letter}",
+                "is_correct_pdf": letter == "B",
+                "is_correct_community": None,
+                "is_correct": letter == "B",
+            }
+            for letter in "ABCD"
+        ],
+        "correct_answer": f"B - {'Opción' if es else 'Option'} B",
+        "explanation": ("Explicación detallada. " if es else "Detailed explanation. ") * 15,
+    }
+
+
+def question_payload(prompt: str) -> str:
+    number = int(QUESTION_RE.search(prompt).group(1))
+    pages = PAGES_RE.search(prompt)
+    start_page, end_page = (int(pages.group(1)), int(pages.group(2))) if pages else (1, 1)
+    if config.payload is not None:
+        payload = copy.deepcopy(config.payload)
+        for lang in ("en", "es"):
+            payload[lang].update(id_question=number, start_page=start_page, end_page=end_page)
+    else:
+        payload = {
+            lang: synthetic_question(number, start_page, end_page, lang) for lang in ("en", "es")
+        }
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def user_text(messages: list) -> str:
+    for message in reversed(messages):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content")
+        if isinstance(content, str):
+            return content
+        return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return ""
+
+
+def completion_content(body: dict) -> str:
+    text = user_text(body.get("messages", []))
+    if QUESTION_RE.search(text):
+        return question_payload(text)
+    return f"[es] {text}"
+
+
+async def simulated_latency():
+    delay = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+    await asyncio.sleep(delay)
+
+
+def usage_for(body: dict, content: str) -> dict:
+    # ~4 caracteres por token; cada imagen cuenta como una página en "high detail"
+    prompt_tokens = 0
+    for message in body.get("messages", []):
+        parts = message.get("content")
+        if isinstance(parts, str):
+            prompt_tokens += len(parts) // 4
+            continue
+        for part in parts or []:
+            prompt_tokens += 765 if part.get("type") == "image_url" else len(part.get("text", "")) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def chunk_event(completion_id: str, model: str, delta: dict, finish_reason=None, usage=None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage is not None:
+        # stream_options.include_usage: fragmento final sin choices
+        chunk.update(choices=[], usage=usage)
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def chat_completions(deployment: str, request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    if random.random() < config.rate_429:
+        stats["throttled"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"code": "429", "message": "Rate limit is exceeded. Try again later."}},
+            headers={
+                "retry-after": str(max(1, config.retry_after_ms // 1000)),
+                "retry-after-ms": str(config.retry_after_ms),
+            },
+        )
+
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    content = completion_content(body)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    if body.get("stream"):
+        stats["streamed"] += 1
+
+        async def events():
+            try:
+                await simulated_latency()
+                yield chunk_event(completion_id, deployment, {"role": "assistant", "content": ""})
+                size = max(1, -(-len(content) // config.stream_chunks))
+                for i in range(0, len(content), size):
+                    await asyncio.sleep(config.stream_chunk_ms / 1000)
+                    yield chunk_event(completion_id, deployment, {"content": content[i : i + size]})
+                yield chunk_event(completion_id, deployment, {}, "stop")
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    yield chunk_event(completion_id, deployment, {}, usage=usage_for(body, content))
+                yield "data: [DONE]\n\n"
+            finally:
+                stats["in_flight"] -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    try:
+        await simulated_latency()
+    finally:
+        stats["in_flight"] -= 1
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": deployment,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": usage_for(body, content),
+    }
+
+
+@app.get("/stats")
+def get_stats():
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--rate-429", type=float, default=config.rate_429, help="0-1")
+    parser.add_argument("--retry-after-ms", type=int, default=config.retry_after_ms)
+    parser.add_argument("--stream-chunk-ms", type=float, default=config.stream_chunk_ms)
+    parser.add_argument("--stream-chunks", type=int, default=config.stream_chunks)
+    parser.add_argument("--payload", help='JSON file with a {"en": ..., "es": ...} question')
+    args = parser.parse_args()
+
+    for name in vars(config):
+        if name != "payload":
+            setattr(config, name, getattr(args, name))
+    if args.payload:
+        with open(args.payload, "r", encoding="utf-8") as f:
+            config.payload = json.load(f)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Micro-benchmarks de las rutas calientes de PDF sobre un examen sintético.
+
+Uso:
+    python -m benchmarks.pdf_benchmark --save benchmarks/pdf_baseline.json
+    python -m benchmarks.pdf_benchmark --compare benchmarks/pdf_baseline.json
+
+Genera con benchmarks.synthetic_pdf un PDF de --questions preguntas (misma
+semilla = mismo PDF) y mide: apertura del documento, extract_text por página,
+construcción completa del índice de texto, escaneo "Question #N" del
+localizador, análisis de layout, rasterizado a 150/200 DPI con pdfium y
+pdfplumber, codificación PNG/JPEG y base64. Las medidas por página usan una
+muestra fija de --sample-pages páginas de preguntas.
+
+--save guarda los resultados (mediana, mínimo y p95 en ms) con los metadatos
+de la ejecución; --compare los contrasta con un baseline anterior y termina
+con código 1 si alguna mediana empeora más de --threshold. Los baselines solo
+son comparables en la misma máquina y con los mismos parámetros.
+"""
+import argparse
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pdfplumber
+import PIL
+import pypdfium2 as pdfium
+
+from app.documents import plumber_pool
+from app.image_budget import analyze_page
+from app.pdf_index import BUILD_WORKERS, PageTextIndex
+from app.question_locator import INDEX_PAGES_SKIP, QuestionLocator
+from app.render import RenderOptions, data_url, encode_image
+from benchmarks.synthetic_pdf import generate_pdf
+
+DPIS = (150, 200)
+
+
+def measure(fn, repeat: int, per: int = 1) -> dict:
+    # fn() se ejecuta `repeat` veces; `per` divide cada muestra (p. ej. por página)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000 / per)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(samples[0], 3),
+        "p95_ms": round(samples[max(0, math.ceil(len(samples) * 0.95) - 1)], 3),
+        "runs": repeat,
+    }
+
+
+def sample_pages(total_pages: int, count: int) -> list:
+    body = list(range(INDEX_PAGES_SKIP, total_pages))
+    step = max(1, len(body) // count)
+    return body[::step][:count]
+
+
+def bench_open(pdf_path: Path, repeat: int) -> dict:
+    def open_plumber():
+        with pdfplumber.open(pdf_path) as pdf:
+            len(pdf.pages)
+
+    def open_pdfium():
+        pdf = pdfium.PdfDocument(str(pdf_path))
+        len(pdf)
+        pdf.close()
+
+    return {
+        "open.pdfplumber": measure(open_plumber, repeat),
+        "open.pdfium": measure(open_pdfium, repeat),
+    }
+
+
+def bench_text(pdf_path: Path, pages: list, repeat: int, build_repeat: int, workdir: Path) -> dict:
+    results = {}
+    with pdfplumber.open(pdf_path) as pdf:
+
+        def extract():
+            # Igual que PageTextIndex._extract: documento abierto, caché de página liberada
+            for i in pages:
+                page = pdf.pages[i]
+                page.extract_text()
+                page.close()
+
+        results["extract_text.page"] = measure(extract, repeat, per=len(pages))
+
+    index_path = workdir / "page_text.json"
+    index = None
+
+    def build():
+        nonlocal index
+        index_path.unlink(missing_ok=True)
+        index = PageTextIndex(pdf_path, index_path)
+        index.build()
+
+    results[f"index.build.workers{BUILD_WORKERS}"] = measure(build, build_repeat)
+    results["index.load"] = measure(lambda: PageTextIndex(pdf_path, index_path), repeat)
+
+    # Solo el escaneo de encabezados, sin el almacén de preguntas (no toca DATA_DIR)
+    locator = QuestionLocator.__new__(QuestionLocator)
+    locator.index = index
+    results["locator.scan"] = measure(locator._scan, repeat)
+    return results
+
+
+def bench_layout(pdf_path: Path, pages: list, repeat: int) -> dict:
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    try:
+        return {
+            "layout.analyze.page": measure(
+                lambda: [analyze_page(pdf, i) for i in pages], repeat, per=len(pages)
+            )
+        }
+    finally:
+        pdf.close()
+
+
+def bench_render(pdf_path: Path, pages: list, repeat: int) -> dict:
+    results = {}
+    pdf = pdfium.PdfDocument(str(pdf_path))
+    plumber = pdfplumber.open(pdf_path)
+    try:
+        for dpi in DPIS:
+            images = []
+
+            def raster_pdfium():
+                images.clear()
+                for i in pages:
+                    page = pdf[i]
+                    images.append(page.render(scale=dpi / 72).to_pil())
+                    page.close()
+
+            def raster_pdfplumber():
+                for i in pages:
+                    page = plumber.pages[i]
+                    page.to_image(resolution=dpi).original
+                    page.close()
+
+            results[f"raster.pdfium.{dpi}"] = measure(raster_pdfium, repeat, per=len(pages))
+            results[f"raster.pdfplumber.{dpi}"] = measure(raster_pdfplumber, repeat, per=len(pages))
+
+            for fmt in ("png", "jpeg"):
+                options = RenderOptions(dpi=dpi, fmt=fmt, grayscale=False, max_pixels=0)
+                encoded = []
+
+                def encode():
+                    encoded[:] = [encode_image(image, options) for image in images]
+
+                results[f"encode.{fmt}.{dpi}"] = measure(encode, repeat, per=len(pages))
+                results[f"base64.{fmt}.{dpi}"] = measure(
+                    lambda: [data_url(data, options) for data in encoded], repeat, per=len(pages)
+                )
+                results[f"size_kb.{fmt}.{dpi}"] = round(
+                    statistics.mean(len(data) for data in encoded) / 1024, 1
+                )
+    finally:
+        plumber.close()
+        pdf.close()
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    print(f"\n{'benchmark':<34}{'baseline':>12}{'now':>12}{'change':>9}")
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not isinstance(result, dict) or not isinstance(before, dict):
+            continue
+        change = result["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<34}{before['median_ms']:>12.2f}{result['median_ms']:>12.2f}{change:>+9.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sample-pages", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--build-repeat", type=int, default=1, help="runs of the full index build")
+    parser.add_argument("--save", type=Path, help="write the results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--keep-pdf", type=Path, help="also write the synthetic PDF here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        pdf_path = workdir / "az-000.pdf"
+        started = time.perf_counter()
+        total_pages = generate_pdf(pdf_path, args.questions, args.seed)
+        generate_ms = (time.perf_counter() - started) * 1000
+        if args.keep_pdf:
+            args.keep_pdf.write_bytes(pdf_path.read_bytes())
+        pages = sample_pages(total_pages, args.sample_pages)
+        print(
+            f"Synthetic PDF: {total_pages} pages, {args.questions} questions, "
+            f"{pdf_path.stat().st_size / 1024:.0f} KB ({generate_ms:.0f} ms); "
+            f"sampling {len(pages)} pages x {args.repeat} runs\n"
+        )
+
+        results = {}
+        for name, bench in (
+            ("open", lambda: bench_open(pdf_path, args.repeat)),
+            ("text", lambda: bench_text(pdf_path, pages, args.repeat, args.build_repeat, workdir)),
+            ("layout", lambda: bench_layout(pdf_path, pages, args.repeat)),
+            ("render", lambda: bench_render(pdf_path, pages, args.repeat)),
+        ):
+            for key, result in bench().items():
+                results[key] = result
+                if isinstance(result, dict):
+                    print(f"{key:<34}{result['median_ms']:>10.2f} ms  (min {result['min_ms']:.2f})")
+                else:
+                    print(f"{key:<34}{result:>10.1f}")
+        plumber_pool.close_all()
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "pdfplumber": pdfplumber.__version__,
+            "pypdfium2": str(pdfium.PYPDFIUM_INFO),
+            "pdfium": str(pdfium.PDFIUM_INFO),
+            "pillow": PIL.__version__,
+            "params": {
+                "questions": args.questions,
+                "seed": args.seed,
+                "pages": total_pages,
+                "sample_pages": pages,
+                "repeat": args.repeat,
+                "index_workers": BUILD_WORKERS,
+            },
+        },
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"]["params"] != report["meta"]["params"]:
+            print("\nWarning: baseline was recorded with different parameters")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+            exit_code = 1
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.save}")
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compara el render de páginas actual (pdfplumber + PNG) con el backend pdfium.
+
+Uso:
+    python -m benchmarks.render_benchmark app/data/az-204.pdf --pages 18-27 --dpi 200
+
+Para cada variante mide el tiempo de render + codificación y los bytes de la
+imagen y del data URL en base64 que se envía al modelo. La caché de render no
+se usa: cada página se renderiza desde cero.
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import pdfplumber
+import pypdfium2 as pdfium
+
+from app.render import RenderOptions, render_page_pdfium, render_page_pdfplumber
+
+
+def parse_pages(value: str):
+    start, _, end = value.partition("-")
+    return list(range(int(start) - 1, int(end or start)))
+
+
+def run_variant(pdf_path: Path, pages, options: RenderOptions, repeat: int):
+    if options.backend == "pdfium":
+        pdf = pdfium.PdfDocument(str(pdf_path))
+        render_page = render_page_pdfium
+    else:
+        pdf = pdfplumber.open(pdf_path)
+        render_page = render_page_pdfplumber
+
+    timings, sizes = [], []
+    try:
+        for _ in range(repeat):
+            for i in pages:
+                started = time.perf_counter()
+                data = render_page(pdf, i, options)
+                timings.append(time.perf_counter() - started)
+                sizes.append(len(data))
+    finally:
+        pdf.close()
+
+    return {
+        "ms_per_page": statistics.median(timings) * 1000,
+        "bytes_per_page": statistics.mean(sizes),
+        "b64_bytes_per_page": statistics.mean(4 * -(-n // 3) for n in sizes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", type=Path)
+    parser.add_argument("--pages", default="18-27", help="1-based range, e.g. 18-27")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--max-pixels", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = parse_pages(args.pages)
+    common = dict(dpi=args.dpi, max_pixels=args.max_pixels, backend="pdfium")
+    variants = {
+        # Ruta original: to_image() de pdfplumber (sin antialiasing) y PNG RGB
+        "pdfplumber png (original)": RenderOptions(
+            dpi=args.dpi, fmt="png", grayscale=False, max_pixels=0, backend="pdfplumber",
+            antialias=False, png_colors=0,
+        ),
+        "pdfium png8 (default)": RenderOptions(fmt="png", grayscale=False, antialias=False, **common),
+        "pdfium png rgb": RenderOptions(
+            fmt="png", grayscale=False, antialias=False, png_colors=0, **common
+        ),
+        "pdfium png gray": RenderOptions(fmt="png", grayscale=True, antialias=False, **common),
+        "pdfium png aa": RenderOptions(
+            fmt="png", grayscale=False, antialias=True, png_colors=0, **common
+        ),
+        "pdfium jpeg": RenderOptions(
+            fmt="jpeg", quality=args.quality, grayscale=False, antialias=False, **common
+        ),
+        "pdfium jpeg aa": RenderOptions(
+            fmt="jpeg", quality=args.quality, grayscale=False, antialias=True, **common
+        ),
+    }
+
+    print(f"{args.pdf.name}: pages {args.pages} at {args.dpi} DPI, {args.repeat} runs\n")
+    print(f"{'variant':<28}{'ms/page':>10}{'KB/page':>10}{'b64 KB':>10}{'speedup':>9}{'size':>8}")
+    baseline = None
+    for name, options in variants.items():
+        result = run_variant(args.pdf, pages, options, args.repeat)
+        baseline = baseline or result
+        print(
+            f"{name:<28}{result['ms_per_page']:>10.1f}"
+            f"{result['bytes_per_page'] / 1024:>10.1f}"
+            f"{result['b64_bytes_per_page'] / 1024:>10.1f}"
+            f"{baseline['ms_per_page'] / result['ms_per_page']:>8.1f}x"
+            f"{result['bytes_per_page'] / baseline['bytes_per_page']:>7.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
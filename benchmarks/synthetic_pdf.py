@@ -0,0 +1,241 @@
+"""Genera PDFs sintéticos con el formato de los PDFs de examen.
+
+Uso:
+    python -m benchmarks.synthetic_pdf app/data/az-000.pdf --questions 300 --seed 1
+
+Mismo diseño que los exámenes reales: 17 páginas de índice (que también
+mencionan "Question #N"), encabezado y pie repetidos en cada página, y
+preguntas seguidas con encabezado "Question #N", contexto, bloque de opciones,
+respuesta correcta y discusión. Parte de las preguntas lleva un diagrama
+(formas vectoriales + una captura JPEG). Con la misma semilla el PDF generado
+es idéntico byte a byte.
+"""
+import argparse
+import io
+import random
+import zlib
+from pathlib import Path
+from typing import List
+
+from PIL import Image, ImageDraw
+
+from app.question_locator import INDEX_PAGES_SKIP
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+MARGIN = 54
+BODY_TOP, BODY_BOTTOM = 730, 60
+WRAP_CHARS = 92
+DIAGRAM_HEIGHT = 190
+DIAGRAM_IMAGES = 8
+
+WORDS = (
+    "Azure Function App Blob Storage container queue trigger binding deployment slot "
+    "App Service plan Cosmos DB partition key consistency level Key Vault managed identity "
+    "secret certificate API Management policy subscription Event Grid topic Service Bus "
+    "message session Logic App workflow Container Registry image Kubernetes cluster "
+    "Application Insights telemetry sampling developer company solution must ensure "
+    "minimize costs configure implement requirement application data access users "
+    "authentication Microsoft Entra ID token scope resource group region latency"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, sentences: int) -> str:
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+
+def _wrap(text: str, width: int = WRAP_CHARS) -> List[str]:
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _escape(text: str) -> bytes:
+    raw = text.encode("cp1252", "replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _diagram_jpeg(rng: random.Random) -> tuple:
+    # "Captura" de un diagrama de arquitectura: cajas, flechas y etiquetas
+    width, height = 900, 480
+    image = Image.new("RGB", (width, height), (250, 250, 252))
+    draw = ImageDraw.Draw(image)
+    boxes = []
+    for _ in range(rng.randint(4, 7)):
+        x, y = rng.randint(20, width - 200), rng.randint(20, height - 110)
+        color = tuple(rng.randint(40, 220) for _ in range(3))
+        draw.rectangle((x, y, x + 170, y + 80), outline=color, width=3, fill=(255, 255, 255))
+        draw.text((x + 12, y + 30), " ".join(rng.choice(WORDS) for _ in range(2)), fill=color)
+        boxes.append((x + 85, y + 40))
+    for (x1, y1), (x2, y2) in zip(boxes, boxes[1:]):
+        draw.line((x1, y1, x2, y2), fill=(90, 90, 90), width=2)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return width, height, buffer.getvalue()
+
+
+class _Writer:
+    def __init__(self, title: str):
+        self.title = title
+        self.pages: List[List[bytes]] = []
+        self.ops: List[bytes] = []
+        self.y = BODY_TOP
+
+    def new_page(self):
+        if self.ops:
+            self.pages.append(self.ops)
+        number = len(self.pages) + 1
+        self.ops = [
+            b"BT /F1 8 Tf %d %d Td (%s) Tj ET" % (MARGIN, PAGE_HEIGHT - 32, _escape(self.title)),
+            b"0.6 G 0.5 w %d %d m %d %d l S" % (MARGIN, PAGE_HEIGHT - 38, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - 38),
+            b"BT /F1 8 Tf %d 30 Td (Page %d) Tj ET" % (PAGE_WIDTH // 2 - 16, number),
+        ]
+        self.y = BODY_TOP
+
+    def ensure(self, height: float):
+        if self.y - height < BODY_BOTTOM:
+            self.new_page()
+
+    def line(self, text: str, font: str = "F1", size: int = 10, leading: int = 13, indent: int = 0):
+        self.ensure(leading)
+        self.ops.append(
+            b"BT /%s %d Tf %d %d Td (%s) Tj ET"
+            % (font.encode(), size, MARGIN + indent, self.y, _escape(text))
+        )
+        self.y -= leading
+
+    def paragraph(self, text: str, indent: int = 0):
+        for line in _wrap(text, WRAP_CHARS - indent // 5):
+            self.line(line, indent=indent)
+        self.y -= 5
+
+    def diagram(self, image_name: str, rng: random.Random):
+        self.ensure(DIAGRAM_HEIGHT + 10)
+        bottom = self.y - DIAGRAM_HEIGHT
+        width = PAGE_WIDTH - 2 * MARGIN
+        self.ops.append(b"0.3 0.4 0.8 RG 1 w %d %d %d %d re S" % (MARGIN, bottom, width, DIAGRAM_HEIGHT))
+        for _ in range(rng.randint(2, 5)):
+            x, y = MARGIN + rng.randint(10, width - 90), bottom + rng.randint(10, DIAGRAM_HEIGHT - 40)
+            self.ops.append(b"0.9 0.5 0.1 RG %d %d 80 30 re S" % (x, y))
+        self.ops.append(
+            b"q %d 0 0 %d %d %d cm /%s Do Q"
+            % (width // 2, DIAGRAM_HEIGHT - 20, MARGIN + width // 2 - 10, bottom + 10, image_name.encode())
+        )
+        self.y = bottom - 10
+
+    def finish(self) -> List[List[bytes]]:
+        if self.ops:
+            self.pages.append(self.ops)
+            self.ops = []
+        return self.pages
+
+
+def _write_question(writer: _Writer, number: int, rng: random.Random):
+    writer.y -= 8
+    writer.ensure(80)
+    writer.line(f"Question #{number}    Topic {1 + number // 100}", font="F2", size=12, leading=20)
+    writer.paragraph(_paragraph(rng, rng.randint(3, 9)))
+    if rng.random() < 0.3:
+        writer.diagram(f"Im{rng.randrange(DIAGRAM_IMAGES)}", rng)
+        writer.paragraph(_paragraph(rng, rng.randint(1, 3)))
+    # Casos de estudio: contexto largo que ocupa varias páginas
+    if rng.random() < 0.05:
+        for _ in range(rng.randint(6, 14)):
+            writer.paragraph(_paragraph(rng, 6))
+    writer.line("Which solution should you use?")
+    letters = "ABCDE"[: rng.randint(3, 5)]
+    for letter in letters:
+        writer.paragraph(f"{letter}. {_paragraph(rng, 1)}", indent=10)
+    correct = rng.choice(letters)
+    writer.line(f"Correct Answer: {correct}", font="F2")
+    writer.line("Community vote distribution")
+    writer.line(f"{correct} ({rng.randint(55, 100)}%)")
+    for _ in range(rng.randint(0, 3)):
+        writer.paragraph(f"user{rng.randint(1, 9999)} - {_paragraph(rng, rng.randint(1, 3))}", indent=10)
+
+
+def generate_pdf(path: Path, questions: int = 300, seed: int = 1, title: str = "AZ-000") -> int:
+    rng = random.Random(seed)
+    writer = _Writer(f"{title} Synthetic Exam - Questions and Answers")
+
+    # Índice: los "Question #N" de estas páginas son falsos positivos para el localizador
+    per_page = -(-questions // INDEX_PAGES_SKIP)
+    for page in range(INDEX_PAGES_SKIP):
+        writer.new_page()
+        writer.line("Contents", font="F2", size=12, leading=20)
+        for number in range(page * per_page + 1, min(questions, (page + 1) * per_page) + 1):
+            writer.line(f"Question #{number} {'.' * 60} Topic {1 + number // 100}", leading=12)
+    writer.new_page()
+    for number in range(1, questions + 1):
+        _write_question(writer, number, rng)
+    pages = writer.finish()
+
+    images = [_diagram_jpeg(rng) for _ in range(DIAGRAM_IMAGES)]
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # /Pages, cuando se conocen las páginas
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    image_refs = []
+    for width, height, jpeg in images:
+        objects.append(
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+            b"/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>\nstream\n%s\nendstream"
+            % (width, height, len(jpeg), jpeg)
+        )
+        image_refs.append(len(objects))
+    xobjects = b" ".join(b"/Im%d %d 0 R" % (i, ref) for i, ref in enumerate(image_refs))
+
+    kids = []
+    for ops in pages:
+        content = zlib.compress(b"\n".join(ops))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> /XObject << %s >> >> >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, len(objects), xobjects)
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(bytes(out))
+    return len(pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--title", default="AZ-000")
+    args = parser.parse_args()
+    pages = generate_pdf(args.output, args.questions, args.seed, args.title)
+    print(f"{args.output}: {pages} pages, {args.questions} questions")
+
+
+if __name__ == "__main__":
+    main()
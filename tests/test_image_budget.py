@@ -0,0 +1,37 @@
+from app.image_budget import PageLayout, _plan_tokens, estimate_image_tokens, plan_pages
+
+LETTER = (612.0, 792.0)
+
+
+def _layout(blocks, has_diagram=False) -> PageLayout:
+    return PageLayout(*LETTER, blocks=blocks, has_diagram=has_diagram, first_band=None, last_band=None)
+
+
+def test_estimate_image_tokens_tiles():
+    assert estimate_image_tokens(512, 512) == 85 + 170
+    # 1700x2200 -> 768x993 tras encajar el lado corto: 2x2 teselas
+    assert estimate_image_tokens(1700, 2200) == 85 + 170 * 4
+
+
+def test_crops_never_cost_more_than_full_pages():
+    layouts = [
+        _layout([(60, 200, 54, 558)]),
+        _layout([(40, 760, 54, 558)]),
+        _layout([(60, 300, 54, 300)], has_diagram=True),
+    ]
+    pages = [17, 18, 19]
+    plan = plan_pages(pages, layouts, max_dpi=200)
+    full = plan_pages(pages, [_layout([]) for _ in layouts], max_dpi=200)
+    by_page = dict(zip(pages, layouts))
+
+    assert [page for page, _ in plan] == pages
+    assert all(not any(options.crop) for _, options in full)
+    assert _plan_tokens(by_page, plan) <= _plan_tokens(by_page, full)
+    # El recorte deja fuera el margen por debajo del último bloque
+    assert plan[0][1].crop[1] > 500
+
+
+def test_blank_pages_are_dropped():
+    layouts = [_layout([(60, 200, 54, 558)]), _layout([])]
+    plan = plan_pages([20, 21], layouts, max_dpi=150)
+    assert [page for page, _ in plan] == [20]
@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+from app.jobs import COMPLETED, DONE, SKIPPED, JobManager
+
+
+def test_job_state_is_persisted_off_the_event_loop(tmp_path):
+    translated = []
+
+    async def translate(pdf_filename, question_number):
+        translated.append(question_number)
+        return {}
+
+    async def run():
+        manager = JobManager(tmp_path, translate, lambda pdf, q: q == 2)
+        job = manager.create("AZ-000.pdf", 1, 3, concurrency=2)
+        await job.task
+        await manager.shutdown()
+        return job
+
+    job = asyncio.run(run())
+    assert sorted(translated) == [1, 3]
+    saved = json.loads(job.path.read_text(encoding="utf-8"))
+    assert saved["status"] == COMPLETED
+    assert saved["questions"] == {"1": DONE, "2": SKIPPED, "3": DONE}
+
+
+def test_resume_continues_pending_questions(tmp_path):
+    async def translate(pdf_filename, question_number):
+        return {}
+
+    async def run():
+        first = JobManager(tmp_path, translate, lambda pdf, q: False)
+        job = first.create("AZ-000.pdf", 1, 2, concurrency=1)
+        job.task.cancel()
+        await first.shutdown()
+
+        second = JobManager(tmp_path, translate, lambda pdf, q: False)
+        second.resume_all()
+        resumed = second.jobs[job.id]
+        await resumed.task
+        await second.shutdown()
+        return resumed
+
+    job = asyncio.run(run())
+    saved = json.loads(job.path.read_text(encoding="utf-8"))
+    assert saved["status"] == COMPLETED
+    assert saved["questions"] == {"1": DONE, "2": DONE}
@@ -0,0 +1,110 @@
+import asyncio
+from contextlib import aclosing
+from types import SimpleNamespace
+
+import pytest
+
+from app import llm
+from app.llm import LLMScheduler, TokenBucket
+
+
+class FakeStream:
+    def __init__(self, deltas, fail_after=None):
+        self.deltas = deltas
+        self.fail_after = fail_after
+        self.closed = False
+
+    async def __aiter__(self):
+        for i, delta in enumerate(self.deltas):
+            if i == self.fail_after:
+                raise RuntimeError("connection reset")
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    scheduler = LLMScheduler(max_concurrency=4, rpm=0, tpm=0)
+    scheduler.limit = 2
+    monkeypatch.setattr(llm, "scheduler", scheduler)
+    streams = []
+
+    def install(**kwargs):
+        stream = FakeStream(["a", "b", "c"], **kwargs)
+        streams.append(stream)
+
+        async def create(**_):
+            return stream
+
+        monkeypatch.setattr(
+            llm, "client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        )
+        return stream
+
+    return scheduler, install
+
+
+def test_token_bucket_waits_for_refill_and_allows_oversized_requests():
+    bucket = TokenBucket(per_minute=60)  # 1/s, capacidad 10
+    now = bucket.updated
+    assert bucket.capacity == 10
+    assert bucket.wait_time(10, now) == 0
+    bucket.consume(10)
+    assert bucket.wait_time(2, now) == pytest.approx(2)
+    assert bucket.wait_time(2, now + 2) == 0
+    # Mayor que la capacidad: espera a que el bucket esté lleno, no para siempre
+    assert bucket.wait_time(50, now + 2) == pytest.approx(8)
+
+
+def test_scheduler_aimd_halves_on_throttle_and_grows_after_successes():
+    scheduler = LLMScheduler(max_concurrency=4, rpm=0, tpm=0)
+
+    async def call(**release):
+        await scheduler.acquire(1, llm.INTERACTIVE)
+        await scheduler.release(**release)
+
+    async def run():
+        await call(throttled=True)
+        assert scheduler.limit == 2
+        await call(failed=True)
+        await call()
+        assert scheduler.limit == 2
+        await call()
+        assert scheduler.limit == 3
+
+    asyncio.run(run())
+    assert scheduler.completed == 2
+    assert scheduler.paused_until > 0
+
+
+def test_stream_closed_when_consumer_disconnects(fake_stream):
+    scheduler, install = fake_stream
+    stream = install()
+
+    async def run():
+        async with aclosing(llm.stream_chat_completion(messages=[])) as deltas:
+            async for delta in deltas:
+                assert delta == "a"
+                break
+
+    asyncio.run(run())
+    assert stream.closed
+    assert scheduler.stats()["running"] == 0
+    # Una desconexión no cuenta como respuesta correcta para el AIMD
+    assert scheduler.completed == 0
+
+
+def test_stream_error_mid_response_is_not_a_success(fake_stream):
+    scheduler, install = fake_stream
+    stream = install(fail_after=1)
+
+    async def run():
+        return [delta async for delta in llm.stream_chat_completion(messages=[])]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+    assert stream.closed
+    assert scheduler.stats()["running"] == 0
+    assert scheduler.completed == 0
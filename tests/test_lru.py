@@ -0,0 +1,26 @@
+from app.lru import LRUCache
+
+
+def test_evicts_least_recently_used_by_item_count():
+    cache = LRUCache(max_items=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"items": 2, "max_items": 2, "hits": 3, "misses": 1, "hit_ratio": 0.75}
+
+
+def test_byte_budget_counts_replacements_and_skips_oversized_values():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("a", b"123")
+    cache.put("b", b"1234567")
+    assert cache.bytes == 10 and len(cache) == 2
+    cache.put("c", b"1")
+    assert cache.get("a") is None
+    assert cache.bytes == 8
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None
+    assert cache.get("b") == b"1234567"
@@ -0,0 +1,37 @@
+from app import pdf_index
+from app.pdf_index import PageTextIndex
+from benchmarks.synthetic_pdf import generate_pdf
+
+
+def test_single_pages_are_persisted_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_index, "SAVE_EVERY_PAGES", 4)
+    pdf_path = tmp_path / "az-000.pdf"
+    generate_pdf(pdf_path, questions=10, seed=1)
+    index_path = tmp_path / "az-000" / "page_text.json"
+
+    index = PageTextIndex(pdf_path, index_path)
+    first = index.get_text(0)
+    index.get_text(1)
+    # Índice nuevo (1) + dos páginas: aún no llega al lote
+    assert not index_path.exists()
+    index.get_text(2)
+    assert index_path.exists()
+
+    index.get_text(3)
+    assert PageTextIndex(pdf_path, index_path).pages.keys() == {0, 1, 2}
+    index.save()
+    reloaded = PageTextIndex(pdf_path, index_path)
+    assert reloaded.pages.keys() == {0, 1, 2, 3}
+    assert reloaded.get_text(0) == first
+
+
+def test_build_fills_missing_pages_and_saves(tmp_path):
+    pdf_path = tmp_path / "az-000.pdf"
+    generate_pdf(pdf_path, questions=10, seed=1)
+    index_path = tmp_path / "az-000" / "page_text.json"
+
+    index = PageTextIndex(pdf_path, index_path)
+    index.get_text(1)
+    index.build(workers=1)
+    assert index.is_complete
+    assert PageTextIndex(pdf_path, index_path).is_complete
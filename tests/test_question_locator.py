@@ -0,0 +1,81 @@
+import pdfplumber
+import pytest
+
+from app.pdf_index import PageTextIndex
+from app.question_locator import (
+    INDEX_PAGES_SKIP,
+    QUESTION_RE,
+    QuestionLocator,
+    has_content_before,
+    page_ranges,
+    running_lines,
+)
+from app.question_store import QuestionStore
+from benchmarks.synthetic_pdf import generate_pdf
+
+
+def test_running_lines_ignores_repeated_header():
+    texts = [
+        "AZ-000 Exam\nQuestion #1 Topic 1\nbody\nPage 1",
+        "AZ-000 Exam\nmore body\nPage 2",
+        "AZ-000 Exam\nQuestion #2 Topic 1\nPage 3",
+    ]
+    assert running_lines(texts) == {"AZ-000 Exam"}
+
+
+def test_has_content_before_skips_ignored_lines():
+    text = "AZ-000 Exam\nQuestion #2 Topic 1"
+    position = text.index("Question")
+    assert not has_content_before(text, position, {"AZ-000 Exam"})
+    assert has_content_before(text, position, set())
+    text = "AZ-000 Exam\ntail of question 1\nQuestion #2 Topic 1"
+    assert has_content_before(text, text.index("Question"), {"AZ-000 Exam"})
+
+
+def test_page_ranges_stop_before_next_heading_at_top_of_page():
+    headers = {1: (17, False), 2: (19, False), 3: (20, True)}
+    assert page_ranges(headers, total_pages=40) == {
+        1: (17, 18),
+        2: (19, 20),
+        3: (20, 30),
+    }
+
+
+def test_page_ranges_last_question_clamped_to_document():
+    assert page_ranges({7: (38, False)}, total_pages=40) == {7: (38, 39)}
+
+
+@pytest.fixture(scope="module")
+def synthetic_locator(tmp_path_factory):
+    root = tmp_path_factory.mktemp("exam")
+    pdf_path = root / "az-000.pdf"
+    generate_pdf(pdf_path, questions=60, seed=1)
+    index = PageTextIndex(pdf_path, root / "az-000" / "page_text.json")
+    index.build(workers=1)
+    store = QuestionStore("az-000", root / "az-000" / "questions.sqlite3")
+    yield pdf_path, QuestionLocator(index, store)
+    store.close()
+
+
+def test_locator_matches_headings_on_synthetic_pdf(synthetic_locator):
+    pdf_path, locator = synthetic_locator
+    # Referencia: líneas del cuerpo de cada página, sin el encabezado y el pie repetidos
+    bodies = {}
+    with pdfplumber.open(pdf_path) as pdf:
+        for i in range(INDEX_PAGES_SKIP, len(pdf.pages)):
+            bodies[i] = (pdf.pages[i].extract_text() or "").splitlines()[1:-1]
+
+    at_top = 0
+    for q_num, (start, end) in locator.scanned.items():
+        next_start = locator.scanned.get(q_num + 1, (None,))[0]
+        if next_start is None:
+            continue
+        first_line = bodies[next_start][0]
+        if QUESTION_RE.match(first_line) and int(QUESTION_RE.match(first_line).group(1)) == q_num + 1:
+            # La siguiente pregunta empieza arriba de su página: no se incluye esa página
+            at_top += 1
+            assert end == next_start - 1
+        else:
+            assert end == next_start
+    assert at_top > 0
+    assert locator.lookup(1)[0] == INDEX_PAGES_SKIP
@@ -0,0 +1,51 @@
+import pytest
+
+from app.question_store import InvalidExamId, QuestionStore, get_question_store
+
+
+def _question(number: int, short: str, explanation: str) -> dict:
+    return {
+        "id_question": number,
+        "short_question": short,
+        "options": [{"letter": "A", "text": "Use a queue trigger", "is_correct": True}],
+        "explanation": explanation,
+        "start_page": 18 + number,
+        "end_page": 18 + number,
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = QuestionStore("az-000", tmp_path / "az-000" / "questions.sqlite3")
+    store.save(1, {"en": (_question(1, "Cosmos DB consistency level", "Session consistency"), "", "", None)})
+    store.save(2, {"en": (_question(2, "Blob Storage lifecycle", "Move blobs to the cool tier"), "", "", None)})
+    store.save(3, {"en": (_question(3, "Key Vault access", "Use a managed identity for Cosmos"), "", "", None)})
+    yield store
+    store.close()
+
+
+def test_search_requires_every_term_first(store):
+    results = store.search("cosmos consistency")
+    assert [r["number"] for r in results] == [1]
+    assert "<mark>" in results[0]["snippet"]
+
+
+def test_search_falls_back_to_any_term(store):
+    # Ninguna pregunta tiene los dos términos: se devuelven las que tienen alguno
+    results = store.search("blob cosmos")
+    assert sorted(r["number"] for r in results) == [1, 2, 3]
+
+
+def test_search_last_token_is_a_prefix(store):
+    assert [r["number"] for r in store.search("lifecyc")] == [2]
+    assert store.search("!!!") == []
+
+
+def test_page_ranges_from_saved_questions(store):
+    assert store.page_ranges("en") == {1: (19, 19), 2: (20, 20), 3: (21, 21)}
+
+
+@pytest.mark.parametrize("exam_id", ["", ".", "..", "../az-204", "a/b"])
+def test_invalid_exam_ids_are_rejected(exam_id):
+    with pytest.raises(InvalidExamId):
+        get_question_store(exam_id)
@@ -0,0 +1,83 @@
+import gzip
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.main import build_questions_page, decode_cursor, encode_cursor
+from app.question_catalog import QUESTION_FIELDS, QuestionCatalog
+from app.responses import accepted_encodings, etag_matches, json_response, variant_etag
+
+
+def _catalog(numbers, discussion=()) -> QuestionCatalog:
+    questions = [
+        {"numero": str(n), "pregunta": f"Q{n}", "opciones": [], "respuesta_correcta": "A", "explicacion": "x" * 50}
+        for n in numbers
+    ]
+    return QuestionCatalog("az-000", "es", questions, ("test",), [n in discussion for n in numbers])
+
+
+def _page(catalog, limit=2, offset=0, cursor=None, indices=None, projected=QUESTION_FIELDS):
+    indices = catalog.filter() if indices is None else indices
+    body, etag, total, next_cursor = build_questions_page(
+        catalog, limit, False, offset, cursor, indices, list(projected)
+    )
+    return [q["numero"] for q in json.loads(body)], etag, total, next_cursor
+
+
+def test_cursor_round_trip_and_invalid_cursor():
+    assert decode_cursor(encode_cursor(123)) == 123
+    with pytest.raises(HTTPException) as error:
+        decode_cursor("not-a-cursor")
+    assert error.value.status_code == 400
+
+
+def test_cursor_pages_walk_the_catalog_without_gaps():
+    # Números con huecos: el cursor apunta a la última pregunta enviada, no a una posición
+    catalog = _catalog([1, 2, 5, 7, 8])
+    seen, cursor = [], None
+    while True:
+        numbers, _, total, cursor = _page(catalog, cursor=cursor)
+        seen += numbers
+        assert total == 5
+        if cursor is None:
+            break
+    assert seen == ["1", "2", "5", "7", "8"]
+
+
+def test_offset_filter_and_projection():
+    catalog = _catalog(range(1, 11), discussion={3, 4, 9})
+    indices = catalog.filter(from_question=3, to_question=9, has_discussion=True)
+    numbers, _, total, cursor = _page(catalog, limit=1, offset=1, indices=indices)
+    assert (numbers, total) == (["4"], 3)
+    assert decode_cursor(cursor) == 4
+
+    body, *_ = build_questions_page(catalog, 1, False, 0, None, catalog.filter(), ["numero"])
+    assert json.loads(body) == [{"numero": "1"}]
+
+
+def test_etag_changes_only_with_the_body():
+    catalog = _catalog(range(1, 6))
+    assert _page(catalog)[1] == _page(catalog)[1]
+    assert _page(catalog)[1] != _page(catalog, offset=1)[1]
+    assert _page(catalog)[1] != _page(catalog, projected=["numero"])[1]
+
+
+def test_json_response_conditional_get_and_gzip():
+    body = json.dumps([{"text": "x" * 2000}]).encode()
+    etag = '"abc"'
+
+    response = json_response(body, "gzip, br", etag=etag)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == variant_etag(etag, "gzip") == '"abc-gzip"'
+    assert gzip.decompress(response.body) == body
+
+    # Ambas representaciones validan el If-None-Match (también débil)
+    for if_none_match in ('"abc"', 'W/"abc-gzip"', '"other", "abc"', "*"):
+        assert json_response(body, "gzip", etag=etag, if_none_match=if_none_match).status_code == 304
+    assert json_response(body, "gzip", etag=etag, if_none_match='"other"').status_code == 200
+
+
+def test_accepted_encodings_ignores_q0():
+    assert accepted_encodings("gzip;q=0, br;q=0.5, identity") == {"br", "identity"}
+    assert not etag_matches(None, ['"abc"'])
@@ -0,0 +1,28 @@
+import os
+
+from app.render import RenderCache, RenderOptions
+
+
+def _key(pdf_hash: str, page_idx: int) -> tuple:
+    return (pdf_hash, page_idx, RenderOptions(dpi=100))
+
+
+def test_put_prunes_least_recently_used_files_over_disk_budget(tmp_path):
+    cache = RenderCache(max_bytes=1024, cache_dir=tmp_path, max_disk_bytes=1000)
+    for page_idx in range(4):
+        cache.put(_key("a" * 64, page_idx), b"x" * 300)
+        path = cache._disk_path(_key("a" * 64, page_idx))
+        os.utime(path, (page_idx, page_idx))
+
+    remaining = sorted(p.name.split("_")[0] for p in (tmp_path / ("a" * 64)).iterdir())
+    assert remaining == ["3", "4"]
+    assert cache.stats()["disk_bytes"] == 600
+
+
+def test_prune_disk_drops_hashes_that_are_no_longer_exams(tmp_path):
+    cache = RenderCache(max_bytes=1024, cache_dir=tmp_path)
+    cache.put(_key("live", 0), b"live")
+    cache.put(_key("gone", 0), b"gone")
+
+    assert cache.prune_disk({"live"}) == 4
+    assert [p.name for p in tmp_path.iterdir()] == ["live"]
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def run():
+        results = await asyncio.gather(*(flights.do("q1", work) for _ in range(5)))
+        # Terminado el trabajo, la clave queda libre para una nueva ejecución
+        assert await flights.do("q1", work) == "done"
+        return results
+
+    assert asyncio.run(run()) == ["done"] * 5
+    assert len(calls) == 2
+    assert flights.stats() == {"in_flight": 0, "leaders": 2, "coalesced": 4}
+
+
+def test_exception_reaches_every_waiter():
+    flights = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(*(flights.do("q1", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flights = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def run():
+        leader = asyncio.ensure_future(flights.do("q1", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("q1", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == 42
+
+
+def test_interactive_requests_do_not_wait_on_background_flights():
+    from app import llm
+    from app.main import flight_key, translation_flights
+
+    key = ("az-000.pdf", 1, 0, 0)
+    release = None
+
+    async def work():
+        await release.wait()
+        return "done"
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        with llm.priority(llm.BACKGROUND):
+            background_key = flight_key(key)
+            background = asyncio.ensure_future(translation_flights.do(background_key, work))
+        await asyncio.sleep(0)
+        # La interactiva abre su propia ejecución en lugar de esperar la del lote
+        interactive_key = flight_key(key)
+        interactive = asyncio.ensure_future(translation_flights.do(interactive_key, work))
+        await asyncio.sleep(0)
+        # Y un lote que llega después se une a la interactiva
+        with llm.priority(llm.BACKGROUND):
+            late_key = flight_key(key)
+        release.set()
+        await asyncio.gather(background, interactive)
+        return background_key, interactive_key, late_key
+
+    background_key, interactive_key, late_key = asyncio.run(run())
+    assert background_key == key + (llm.BACKGROUND,)
+    assert interactive_key == key + (llm.INTERACTIVE,)
+    assert late_key == interactive_key
@@ -0,0 +1,59 @@
+import gzip
+import os
+
+from app.static_files import StaticManifest, asset_etag_matches, choose_encoding
+
+
+def _write(path, data: bytes, mtime_ns: int = None):
+    path.write_bytes(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_variants_are_compressed_on_first_request(tmp_path):
+    _write(tmp_path / "index.html", b"<html></html>")
+    _write(tmp_path / "main-2ZDOXOKG.js", b"var a = 1;\n" * 500)
+    manifest = StaticManifest(tmp_path)
+    manifest.load()
+
+    asset = manifest.resolve("main-2ZDOXOKG.js")
+    assert asset.encoded["gzip"] is None
+    assert choose_encoding(asset, "gzip") == "gzip"
+    assert gzip.decompress(asset.get_encoded("gzip")) == b"var a = 1;\n" * 500
+    assert asset_etag_matches(asset.variant_etag("gzip"), asset)
+    # Archivos pequeños se sirven tal cual
+    assert choose_encoding(manifest.resolve("/home"), "gzip, br") is None
+
+
+def test_build_precompressed_variants_are_preferred(tmp_path):
+    _write(tmp_path / "index.html", b"<html></html>")
+    _write(tmp_path / "app.js", b"x" * 4096)
+    _write(tmp_path / "app.js.gz", b"prebuilt")
+    manifest = StaticManifest(tmp_path)
+    manifest.load()
+
+    asset = manifest.resolve("app.js")
+    assert "app.js.gz" not in manifest.assets
+    assert choose_encoding(asset, "br, gzip") == "gzip"
+    assert asset.get_encoded("gzip") == b"prebuilt"
+
+
+def test_unhashed_assets_keep_the_bytes_their_etag_describes(tmp_path):
+    _write(tmp_path / "index.html", b"<html>v1</html>")
+    _write(tmp_path / "main-2ZDOXOKG.js", b"var a;")
+    manifest = StaticManifest(tmp_path)
+    manifest.load()
+    index = manifest.resolve("/home")
+    etag = index.etag
+
+    # Reescribir el archivo no cambia lo que se sirve hasta recargar
+    _write(tmp_path / "index.html", b"<html>v2!</html>")
+    assert index.data == b"<html>v1</html>"
+    assert index.size == len(index.data)
+    assert manifest.resolve("main-2ZDOXOKG.js").data is None
+
+    _write(tmp_path / "main-NEW12345.js", b"var b;")
+    manifest.load()
+    assert manifest.index.data == b"<html>v2!</html>"
+    assert manifest.index.etag != etag
+    assert "main-NEW12345.js" in manifest.assets
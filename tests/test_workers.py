@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from app.workers import BoundedExecutor
+
+
+def test_cancelled_awaiter_keeps_slot_until_task_finishes():
+    executor = BoundedExecutor("test", workers=1, max_pending=4, retry_after=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    async def run():
+        running = asyncio.create_task(executor.run(blocking))
+        queued = asyncio.create_task(executor.run(blocking))
+        await asyncio.to_thread(started.wait, 5)
+        assert executor.stats()["pending"] == 2
+
+        running.cancel()
+        queued.cancel()
+        await asyncio.gather(running, queued, return_exceptions=True)
+        # La tarea en cola se descarta; la que corre sigue ocupando su hueco
+        stats = executor.stats()
+        assert stats["pending"] == 1
+        assert stats["running"] == 1
+
+        release.set()
+        for _ in range(100):
+            if executor.stats()["pending"] == 0:
+                break
+            await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(run())
+    finally:
+        release.set()
+        executor.shutdown()
+    stats = executor.stats()
+    assert stats["pending"] == 0
+    assert stats["running"] == 0
+    assert stats["completed"] == 1